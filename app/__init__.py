@@ -2,8 +2,15 @@ from flask import Flask
 from .routes.create import create as create_blueprint
 from .routes.feed import feed as feed_blueprint
 from .routes.index import index as index_blueprint
-from config.config import MAX_REQUEST_SIZE
+from .routes.audio import audio as audio_blueprint
+from .routes.metrics import metrics as metrics_blueprint
+from .middleware.metrics import init_request_metrics
+from .services.background_tasks import start_workers
+from .commands import backfill_audio_command, delete_episode_command, encode_renditions_command
+from config.config import MAX_REQUEST_SIZE, FLASK_DEBUG
 import logging
+import os
+import sys
 
 def create_app():
     app = Flask(__name__)
@@ -33,5 +40,20 @@ def create_app():
     app.register_blueprint(index_blueprint, url_prefix='/')
     app.register_blueprint(create_blueprint, url_prefix='/create')
     app.register_blueprint(feed_blueprint, url_prefix='/feed')
+    app.register_blueprint(audio_blueprint, url_prefix='/static/audio')
+    app.register_blueprint(metrics_blueprint, url_prefix='/metrics')
+    init_request_metrics(app)
+
+    # Maintenance commands, run with e.g. `flask --app app backfill-audio`
+    app.cli.add_command(backfill_audio_command)
+    app.cli.add_command(encode_renditions_command)
+    app.cli.add_command(delete_episode_command)
+
+    # Start background workers, resuming any unfinished jobs. With the debug
+    # reloader, only the child process that actually serves requests runs them,
+    # and flask CLI commands other than `run` don't serve requests at all.
+    running_command = os.environ.get('FLASK_RUN_FROM_CLI') == 'true' and 'run' not in sys.argv[1:]
+    if not running_command and (not FLASK_DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        start_workers()
 
     return app
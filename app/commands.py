@@ -0,0 +1,71 @@
+import click
+import logging
+from config.config import AUDIO_PATH
+from .services.database_service import db
+from .services.audio_service import RENDITION_PROFILES, read_audio_info
+from .services.tts_service import create_renditions, format_duration
+
+logger = logging.getLogger(__name__)
+
+@click.command('backfill-audio')
+def backfill_audio_command():
+    """Record duration, size, bitrate and hash for episodes created before they were stored."""
+    filenames = db.get_episodes_missing_audio_info()
+    updated = 0
+    for filename in filenames:
+        path = AUDIO_PATH / filename
+        if not path.exists():
+            click.echo(f'Skipping {filename}: file not found')
+            continue
+        try:
+            audio_info = read_audio_info(path)
+        except Exception as e:
+            click.echo(f'Skipping {filename}: {str(e)}')
+            continue
+        if db.update_episode_audio_info(filename, format_duration(audio_info.duration), audio_info):
+            updated += 1
+
+    click.echo(f'Updated {updated} of {len(filenames)} episodes')
+
+@click.command('encode-renditions')
+def encode_renditions_command():
+    """Encode existing episodes to any AUDIO_RENDITIONS profiles they don't have yet."""
+    if not RENDITION_PROFILES:
+        click.echo('No renditions configured; set AUDIO_RENDITIONS first')
+        return
+
+    episodes = db.get_rendition_profiles()
+    updated = 0
+    for filename, existing in episodes.items():
+        missing = [profile for profile in RENDITION_PROFILES if profile.name not in existing]
+        if not missing:
+            continue
+        path = AUDIO_PATH / filename
+        if not path.exists():
+            click.echo(f'Skipping {filename}: file not found')
+            continue
+        renditions = create_renditions(path, missing)
+        if not renditions:
+            click.echo(f'Skipping {filename}: encoding failed')
+            continue
+        if db.add_renditions(filename, renditions):
+            updated += 1
+
+    click.echo(f'Encoded renditions for {updated} of {len(episodes)} episodes')
+
+@click.command('delete-episode')
+@click.argument('filename')
+def delete_episode_command(filename):
+    """Delete an episode by its audio filename, along with its renditions and audio files."""
+    filenames = db.delete_episode(filename)
+    if filenames is None:
+        click.echo(f'No episode {filename}')
+        return
+
+    for name in filenames:
+        try:
+            (AUDIO_PATH / name).unlink(missing_ok=True)
+        except OSError as e:
+            click.echo(f'Could not remove {name}: {str(e)}')
+
+    click.echo(f'Deleted {filename} and {len(filenames) - 1} renditions')
@@ -0,0 +1,21 @@
+import time
+from flask import g, request
+from ..services.metrics_service import REQUEST_SECONDS
+
+# Blueprints whose request latency is recorded
+TIMED_BLUEPRINTS = {'index', 'feed', 'create'}
+
+def init_request_metrics(app):
+    """Record the latency of page, feed and API requests by route."""
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop('request_start', None)
+        if start is not None and request.blueprint in TIMED_BLUEPRINTS and request.url_rule is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                    route=request.url_rule.rule, status=response.status_code)
+        return response
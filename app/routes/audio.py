@@ -0,0 +1,55 @@
+from flask import Blueprint, Response, abort, send_from_directory
+from pathlib import Path
+from urllib.parse import quote
+from config.config import AUDIO_PATH, AUDIO_SENDFILE, AUDIO_ACCEL_PREFIX, AUDIO_CACHE_MAX_AGE
+import logging
+
+logger = logging.getLogger(__name__)
+
+audio = Blueprint('audio', __name__)
+
+AUDIO_MIMETYPES = {
+    '.mp3': 'audio/mpeg',
+    '.opus': 'audio/ogg',
+    '.m4a': 'audio/mp4',
+}
+
+@audio.route('/<path:filename>')
+def serve_audio(filename):
+    """Serve an episode file with Range support and long-lived caching.
+
+    Episode filenames are unique and never rewritten, so clients may cache
+    them indefinitely. With AUDIO_SENDFILE set, the file body is handed off
+    to the front-end web server instead of being streamed by a waitress thread.
+    """
+    # Only finished episodes are served; tmp/ and cache/ stay private
+    if '/' in filename or filename.startswith('.'):
+        abort(404)
+
+    path = Path(AUDIO_PATH) / filename
+    if not path.is_file():
+        abort(404)
+
+    if AUDIO_SENDFILE == 'x-accel-redirect':
+        # nginx serves the file (including Range requests) from an internal location
+        response = Response(mimetype=AUDIO_MIMETYPES.get(path.suffix, 'application/octet-stream'))
+        response.headers['X-Accel-Redirect'] = AUDIO_ACCEL_PREFIX + quote(filename)
+    elif AUDIO_SENDFILE == 'x-sendfile':
+        # Apache/lighttpd serve the file by absolute path
+        response = Response(mimetype=AUDIO_MIMETYPES.get(path.suffix, 'application/octet-stream'))
+        response.headers['X-Sendfile'] = str(path.resolve())
+    else:
+        # Handles ETag, If-None-Match and Range (206) itself
+        response = send_from_directory(
+            AUDIO_PATH, filename,
+            mimetype=AUDIO_MIMETYPES.get(path.suffix),
+            conditional=True,
+            etag=True,
+            max_age=AUDIO_CACHE_MAX_AGE
+        )
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.public = True
+    response.cache_control.max_age = AUDIO_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify, render_template
-from ..services.background_tasks import process_episode_async
-from ..services.content_service import validate_input
+from flask import Blueprint, request, jsonify, render_template, url_for
+from ..services.background_tasks import process_episode_async, process_batch_async, get_job_status
+from ..services.content_service import check_input
 from ..middleware.auth import require_api_key
+from config.config import MAX_BATCH_SIZE
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,18 +24,19 @@ def create_episode_endpoint():
         return jsonify({'error': 'Missing input parameter'}), 400
 
     try:
-        # Validate input and fetch URL content if necessary
-        # This will raise ValueError if input is empty
-        # or RequestException if URL fetch fails
-        content, original_url = validate_input(data['input'])
+        # Validate input without fetching; URLs are fetched in the background
+        # This will raise ValueError if input is empty or too large
+        content, original_url = check_input(data['input'])
 
-        # Start background processing with pre-validated content
-        process_episode_async(content, original_url)
+        # Queue background processing
+        job_id = process_episode_async(content, original_url)
 
         # Return immediately with acceptance message
         return jsonify({
             'message': 'Request accepted for processing',
-            'status': 'processing'
+            'status': 'processing',
+            'job_id': job_id,
+            'status_url': url_for('create.job_status', job_id=job_id)
         }), 202
 
     except ValueError as e:
@@ -43,3 +45,60 @@ def create_episode_endpoint():
     except Exception as e:
         logger.error(f'Error initiating processing: {str(e)}')
         return jsonify({'error': str(e)}), 500
+
+@create.route('/batch', methods=['POST'])
+@require_api_key
+def create_batch_endpoint():
+    """Create episodes from a list of inputs (texts or URLs)."""
+    data = request.get_json()
+
+    if not data or not isinstance(data.get('inputs'), list):
+        return jsonify({'error': 'Missing inputs parameter'}), 400
+    if len(data['inputs']) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds maximum of {MAX_BATCH_SIZE} inputs'}), 400
+
+    try:
+        # Validate every input first; invalid ones are reported individually
+        results = []
+        valid = []
+        for index, input_text in enumerate(data['inputs']):
+            try:
+                if not isinstance(input_text, str):
+                    raise ValueError('Input must be a string')
+                valid.append((index, check_input(input_text)))
+            except ValueError as e:
+                results.append({'index': index, 'error': str(e)})
+
+        # Inputs that fail to queue are reported individually too
+        accepted = 0
+        queued = process_batch_async([item for _, item in valid])
+        for (index, _), (job_id, duplicate, error) in zip(valid, queued):
+            if error is not None:
+                results.append({'index': index, 'error': error})
+                continue
+            accepted += 1
+            results.append({
+                'index': index,
+                'job_id': job_id,
+                'duplicate': duplicate,
+                'status_url': url_for('create.job_status', job_id=job_id)
+            })
+
+        results.sort(key=lambda result: result['index'])
+        return jsonify({
+            'message': f'{accepted} of {len(results)} inputs accepted for processing',
+            'jobs': results
+        }), 202
+
+    except Exception as e:
+        logger.error(f'Error initiating batch processing: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+@create.route('/<int:job_id>', methods=['GET'])
+@require_api_key
+def job_status(job_id):
+    """Report the progress of an episode creation job."""
+    status = get_job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
@@ -1,5 +1,5 @@
-from flask import Blueprint, Response
-from ..services.feed_service import generate_feed
+from flask import Blueprint, Response, request
+from ..services import feed_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,10 +8,17 @@ feed = Blueprint('feed', __name__)
 
 @feed.route('')
 def get_feed():
-    """Generate and return the RSS feed."""
+    """Return the RSS feed, or 304 if the client's copy is current."""
     try:
-        rss_xml = generate_feed()
-        return Response(rss_xml, mimetype='application/xml')
+        rendered = feed_service.get_feed(request.args.get('cursor'), request.args.get('rendition'))
+        response = Response(rendered.xml, mimetype='application/xml')
+        response.set_etag(rendered.etag)
+        response.last_modified = rendered.last_modified
+        # Let clients cache but always revalidate, so new episodes show up promptly
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except ValueError:
+        return Response('Invalid feed cursor or rendition', status=400)
     except Exception as e:
         logger.error(f'Error generating feed: {str(e)}')
         return Response('Error generating RSS feed', status=500)
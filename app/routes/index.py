@@ -1,40 +1,58 @@
-from flask import Blueprint, render_template
-from ..services.feed_service import generate_feed
-from ..services.database_service import db
-from config.config import FEED_TITLE, FEED_DESCRIPTION, FEED_IMAGE
+from flask import Blueprint, render_template, request, abort
+from ..services.database_service import db, decode_cursor
+from config.config import FEED_TITLE, FEED_DESCRIPTION, FEED_IMAGE, HOME_PAGE_SIZE
 from datetime import datetime
-from email.utils import parsedate_to_datetime
-from datetime import timezone
+import threading
 
 index = Blueprint('index', __name__)
 
-@index.route('/')
-def home():
-    """Render the home page with feed episodes."""
-    episodes = db.get_all_episodes()
+# Rendered pages keyed by cursor (None is the newest page), valid for one database version
+_cache = {'version': None, 'pages': {}}
+_cache_lock = threading.Lock()
+MAX_CACHED_PAGES = 32
+
+def render_home(cursor, before):
+    """Render one page of episodes as HTML."""
+    episodes, next_cursor = db.get_episodes_page(HOME_PAGE_SIZE, before)
 
     # Format episodes with local time
     formatted_episodes = []
     for episode in episodes:
-        filename, title, description, pub_date, duration = episode
-
-        # Parse the GMT timestamp and convert to local time
-        dt = parsedate_to_datetime(pub_date)
-        local_dt = dt.astimezone()
-
-        # Format in desired format
-        formatted_date = local_dt.strftime("%a, %b %d, %Y %I:%M %p")
-
+        local_dt = datetime.fromtimestamp(episode['published_at'])
         formatted_episodes.append((
-            filename,
-            title,
-            description.strip().replace('\r\n', '\n').replace('\r', '\n').replace('\n\n', '\n').replace('\n', '<br>'),
-            formatted_date,
-            duration
+            episode['filename'],
+            episode['title'],
+            episode['description_html'],
+            local_dt.strftime("%a, %b %d, %Y %I:%M %p"),
+            episode['duration']
         ))
 
     return render_template('index.html',
                          episodes=formatted_episodes,
+                         is_first_page=cursor is None,
+                         next_cursor=next_cursor,
                          feed_title=FEED_TITLE,
                          feed_description=FEED_DESCRIPTION,
                          feed_image=FEED_IMAGE)
+
+@index.route('/')
+def home():
+    """Render the home page with one page of feed episodes, rebuilding it only when episodes change."""
+    cursor = request.args.get('cursor')
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(400)
+
+    with _cache_lock:
+        # Read the version before rendering so a concurrent change triggers another rebuild
+        version = db.version
+        if _cache['version'] != version or len(_cache['pages']) >= MAX_CACHED_PAGES:
+            _cache['pages'] = {}
+            _cache['version'] = version
+
+        page = _cache['pages'].get(cursor)
+        if page is None:
+            page = render_home(cursor, before)
+            _cache['pages'][cursor] = page
+        return page
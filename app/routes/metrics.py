@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from ..services.metrics_service import render_metrics
+
+metrics = Blueprint('metrics', __name__)
+
+@metrics.route('')
+def get_metrics():
+    """Expose pipeline and request metrics in the Prometheus text format."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,328 @@
+import hashlib
+import os
+import subprocess
+import threading
+import uuid
+import logging
+from collections import namedtuple
+from pathlib import Path
+from mutagen import File as MutagenFile
+from config.config import FFMPEG_BINARY, ASSET_CACHE_PATH, AUDIO_RENDITIONS
+from .cache_service import make_key
+
+logger = logging.getLogger(__name__)
+
+# MPEG audio version ids (header bits 19-20) and Layer III lookup tables
+MPEG_VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+
+FrameHeader = namedtuple('FrameHeader', 'version sample_rate channels bitrate length samples tag_offset')
+
+# Stream parameters that must match for frames to be concatenated without re-encoding
+Mp3Format = namedtuple('Mp3Format', 'version sample_rate channels bitrate')
+
+# Properties of a finished audio file, stored with its episode
+AudioInfo = namedtuple('AudioInfo', 'duration size bitrate sha256')
+
+# Encoders available for renditions: ffmpeg encoder, container, file extension and MIME type
+RenditionCodec = namedtuple('RenditionCodec', 'encoder container extension mimetype')
+RENDITION_CODECS = {
+    'opus': RenditionCodec('libopus', 'ogg', '.opus', 'audio/ogg'),
+    'aac': RenditionCodec('aac', 'mp4', '.m4a', 'audio/mp4'),
+    'mp3': RenditionCodec('libmp3lame', 'mp3', '.mp3', 'audio/mpeg'),
+}
+
+# An extra encoding of each episode, and one written for a particular episode
+RenditionProfile = namedtuple('RenditionProfile', 'name codec bitrate channels')
+Rendition = namedtuple('Rendition', 'profile path mimetype info')
+
+# Conformed asset paths by asset version and target format
+_conformed_assets = {}
+_conformed_assets_lock = threading.Lock()
+
+def parse_frame_header(data, pos=0):
+    """Parse an MPEG Layer III frame header at pos, or return None if there isn't one."""
+    if len(data) < pos + 4:
+        return None
+    b1, b2, b3, b4 = data[pos], data[pos + 1], data[pos + 2], data[pos + 3]
+    if b1 != 0xFF or (b2 & 0xE0) != 0xE0:
+        return None
+
+    version = MPEG_VERSIONS.get((b2 >> 3) & 0b11)
+    layer = (b2 >> 1) & 0b11
+    bitrate_index = (b3 >> 4) & 0x0F
+    sample_rate_index = (b3 >> 2) & 0b11
+    if version is None or layer != 0b01 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    table = 1 if version == 1 else 2
+    bitrate = BITRATES[table][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b3 >> 1) & 1
+    channels = 1 if (b4 >> 6) == 0b11 else 2
+    crc = 0 if b2 & 1 else 2
+
+    if version == 1:
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+        side_info = 17 if channels == 1 else 32
+    else:
+        length = 72 * bitrate // sample_rate + padding
+        samples = 576
+        side_info = 9 if channels == 1 else 17
+
+    return FrameHeader(version, sample_rate, channels, bitrate, length, samples, pos + 4 + crc + side_info)
+
+def id3v2_size(data):
+    """Return the size of a leading ID3v2 tag, or 0 if there isn't one."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def is_info_frame(data, header, pos):
+    """Check whether a frame holds a Xing/Info/VBRI tag rather than audio."""
+    tag = data[header.tag_offset:header.tag_offset + 4]
+    return tag in (b'Xing', b'Info') or data[pos + 36:pos + 40] == b'VBRI'
+
+def iter_mp3_frames(data):
+    """Yield (header, frame bytes) for each audio frame, skipping tags and resyncing over junk."""
+    view = memoryview(data)
+    pos = id3v2_size(data)
+    end = len(data)
+    if end - pos >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128  # ID3v1 tag
+
+    first = True
+    while pos + 4 <= end:
+        header = parse_frame_header(data, pos)
+        if header is None or pos + header.length > end:
+            next_sync = data.find(b'\xff', pos + 1, end)
+            if next_sync == -1:
+                break
+            pos = next_sync
+            continue
+
+        if not (first and is_info_frame(data, header, pos)):
+            yield header, view[pos:pos + header.length]
+        first = False
+        pos += header.length
+
+def probe_mp3(path):
+    """Return the Mp3Format of a file if it is constant bitrate, otherwise None."""
+    data = Path(path).read_bytes()
+    mp3_format = None
+    for header, _ in iter_mp3_frames(data):
+        frame_format = Mp3Format(header.version, header.sample_rate, header.channels, header.bitrate)
+        if mp3_format is None:
+            mp3_format = frame_format
+        elif frame_format != mp3_format:
+            return None  # Variable bitrate or mixed streams
+    return mp3_format
+
+def stream_format(path, bitrate):
+    """Return the format to join a file's audio in without re-encoding it where possible.
+
+    That is the file's own format if it is constant bitrate, otherwise its sample
+    rate and channels at the given bitrate (in bits per second). Returns None if
+    the file has no MP3 frames.
+    """
+    data = Path(path).read_bytes()
+    first = None
+    for header, _ in iter_mp3_frames(data):
+        frame_format = Mp3Format(header.version, header.sample_rate, header.channels, header.bitrate)
+        if first is None:
+            first = frame_format
+        elif frame_format != first:
+            return first._replace(bitrate=bitrate)
+    return first
+
+class Mp3Writer:
+    """Write an MP3 file by appending the audio frames of other files as they become available.
+
+    Inputs in any format other than mp3_format are re-encoded to it one at a time
+    before being appended, so the output is a single constant-bitrate stream.
+    Duration, size and hash are measured from the frames as they're written.
+    """
+
+    def __init__(self, output_path, mp3_format):
+        self.output_path = Path(output_path)
+        self.mp3_format = mp3_format
+        self._output = open(self.output_path, 'wb')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.duration = 0.0
+
+    def append(self, input_path):
+        """Append the audio of an input file."""
+        data = Path(input_path).read_bytes()
+        frames = list(iter_mp3_frames(data))
+        if any(
+            Mp3Format(header.version, header.sample_rate, header.channels, header.bitrate) != self.mp3_format
+            for header, _ in frames
+        ):
+            logger.info(f'Re-encoding {Path(input_path).name} to match the output format')
+            tmp_path = self.output_path.parent / f'.{self.output_path.stem}.{uuid.uuid4().hex[:6]}.mp3'
+            try:
+                encode_mp3(input_path, tmp_path, self.mp3_format)
+                data = tmp_path.read_bytes()
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            frames = iter_mp3_frames(data)
+
+        for header, frame in frames:
+            self._output.write(frame)
+            self._digest.update(frame)
+            self.size += header.length
+            self.duration += header.samples / header.sample_rate
+
+    def close(self):
+        """Finish the file and return its AudioInfo."""
+        self._output.close()
+        bitrate = round(self.size * 8 / self.duration) if self.duration else 0
+        return AudioInfo(self.duration, self.size, bitrate, self._digest.hexdigest())
+
+    def discard(self):
+        """Close and delete a partially written file."""
+        self._output.close()
+        self.output_path.unlink(missing_ok=True)
+
+def read_audio_info(path):
+    """Measure the duration, size, average bitrate and hash of an audio file."""
+    path = Path(path)
+    data = path.read_bytes()
+    seconds = 0.0
+    if path.suffix == '.mp3':
+        seconds = sum(header.samples / header.sample_rate for header, _ in iter_mp3_frames(data))
+    if not seconds:
+        # Not MP3; let mutagen read the duration from the container
+        audio = MutagenFile(path)
+        seconds = audio.info.length if audio is not None else 0.0
+    size = len(data)
+    return AudioInfo(seconds, size, round(size * 8 / seconds) if seconds else 0, hashlib.sha256(data).hexdigest())
+
+def encode_mp3(input_path, output_path, mp3_format):
+    """Encode an audio file to a constant bitrate MP3 with the given format."""
+    command = [
+        FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', str(input_path),
+        '-map', '0:a', '-map_metadata', '-1',
+        '-ar', str(mp3_format.sample_rate),
+        '-ac', str(mp3_format.channels),
+        '-b:a', f'{mp3_format.bitrate // 1000}k',
+        '-write_xing', '0',
+        '-f', 'mp3',
+        str(output_path),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'ffmpeg failed: {result.stderr.strip()}')
+    return output_path
+
+def parse_bitrate(quality):
+    """Convert a bitrate setting such as '192k' to bits per second."""
+    quality = quality.lower()
+    return int(float(quality[:-1]) * 1000) if quality.endswith('k') else int(quality)
+
+def parse_rendition_profiles(spec):
+    """Parse an AUDIO_RENDITIONS setting such as 'opus:48k:1,aac:64k' into RenditionProfiles.
+
+    Raises ValueError for an unknown codec or a malformed profile.
+    """
+    profiles = []
+    for entry in (part.strip() for part in spec.split(',')):
+        if not entry:
+            continue
+        parts = entry.lower().split(':')
+        try:
+            if len(parts) not in (2, 3) or parts[0] not in RENDITION_CODECS:
+                raise ValueError
+            bitrate = parse_bitrate(parts[1])
+            channels = int(parts[2]) if len(parts) == 3 else None
+            if bitrate <= 0 or channels not in (None, 1, 2):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid rendition profile '{entry}', expected codec:bitrate[:channels] "
+                             f"with codec one of: {', '.join(RENDITION_CODECS)}")
+
+        name = f'{parts[0]}-{bitrate // 1000}k' + {None: '', 1: '-mono', 2: '-stereo'}[channels]
+        if any(profile.name == name for profile in profiles):
+            raise ValueError(f"Duplicate rendition profile '{entry}'")
+        profiles.append(RenditionProfile(name, parts[0], bitrate, channels))
+    return profiles
+
+def encode_renditions(input_path, outputs):
+    """Encode an audio file to several renditions with a single ffmpeg process.
+
+    outputs is a list of (RenditionProfile, output path). The input is decoded
+    once and fed to every encoder. Returns the AudioInfo of each output, in order.
+    """
+    command = [FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y', '-i', str(input_path)]
+    for profile, output_path in outputs:
+        codec = RENDITION_CODECS[profile.codec]
+        command += ['-map', '0:a', '-map_metadata', '-1', '-c:a', codec.encoder, '-b:a', str(profile.bitrate)]
+        if profile.channels:
+            command += ['-ac', str(profile.channels)]
+        if profile.codec == 'opus':
+            command += ['-application', 'voip']  # Tuned for speech
+        if codec.container == 'mp4':
+            command += ['-movflags', '+faststart']  # Index first so players can start before downloading it all
+        command += ['-f', codec.container, str(output_path)]
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'ffmpeg failed: {result.stderr.strip()}')
+    return [read_audio_info(output_path) for _, output_path in outputs]
+
+def conform_asset(path, mp3_format):
+    """Return a version of an audio asset that can be frame-copied alongside mp3_format audio.
+
+    The asset is encoded once per change of its contents and target format; the
+    result is kept on disk across restarts and its path memoized in memory.
+    Returns the original path if it already matches or can't be encoded.
+    """
+    path = Path(path)
+    stat = path.stat()
+    key = make_key('asset', path.resolve(), stat.st_mtime_ns, stat.st_size, *mp3_format)
+
+    with _conformed_assets_lock:
+        conformed = _conformed_assets.get(key)
+        if conformed is not None and conformed.exists():
+            return conformed
+
+        if probe_mp3(path) == mp3_format:
+            conformed = path
+        else:
+            conformed = ASSET_CACHE_PATH / f'{path.stem}-{key[:16]}.mp3'
+            if not conformed.exists():
+                tmp_path = ASSET_CACHE_PATH / f'.{conformed.name}.{uuid.uuid4().hex[:6]}'
+                try:
+                    ASSET_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+                    encode_mp3(path, tmp_path, mp3_format)
+                    os.replace(tmp_path, conformed)
+                except Exception as e:
+                    logger.warning(f'Could not re-encode {path.name}, using it as is: {str(e)}')
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+                    return path
+                logger.info(f'Re-encoded {path.name} to {mp3_format.sample_rate} Hz, {mp3_format.bitrate // 1000}k')
+
+                # Drop encodings of earlier versions of the asset
+                for stale in ASSET_CACHE_PATH.glob(f'{path.stem}-*.mp3'):
+                    if stale != conformed and stale not in _conformed_assets.values():
+                        stale.unlink(missing_ok=True)
+
+        _conformed_assets[key] = conformed
+        return conformed
+
+# Renditions encoded for each new episode
+RENDITION_PROFILES = parse_rendition_profiles(AUDIO_RENDITIONS)
@@ -1,33 +1,303 @@
+import json
 import threading
+import time
 import logging
-from .tts_service import create_episode
-from .content_service import process_validated_input
+from contextlib import contextmanager
+from pathlib import Path
+import requests
+from config.config import JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL, CLEANUP_CHUNK_SIZE, BASE_URL
+from .tts_service import (
+    split_text,
+    create_filename,
+    ensure_temp_directory,
+    synthesize_episode,
+    synthesize_episode_stream,
+    publish_episode
+)
+from .content_service import (
+    fetch_url_content,
+    prefetch_urls,
+    extract_content,
+    clean_text_with_gpt,
+    clean_text_chunks,
+    generate_title,
+    generate_summary,
+    build_description,
+    run_stages,
+    llm_executor
+)
+from .database_service import db
+from .metrics_service import STAGE_SECONDS, JOBS_IN_FLIGHT, JOBS_FINISHED
 
 logger = logging.getLogger(__name__)
 
-def process_episode_async(content, original_url=None):
-    """Process episode creation in a background thread."""
-    def _process():
+# Job stages, in order. A job's stage is the last one it completed.
+STAGES = ('submitted', 'fetched', 'cleaned', 'titled', 'combined', 'published')
+
+_workers = []
+_workers_lock = threading.Lock()
+_wakeup = threading.Condition()
+
+def process_episode_async(content=None, original_url=None):
+    """Queue validated input for episode creation and return the job id.
+
+    Pass content for text input, or only original_url to have the page
+    fetched in the background.
+    """
+    stage = 'fetched' if content is not None else 'submitted'
+    job_id = db.add_job(stage, content=content, original_url=original_url)
+    if job_id is None:
+        raise RuntimeError('Could not queue episode for processing')
+
+    start_workers()
+    with _wakeup:
+        _wakeup.notify()
+
+    logger.info(f'Queued job {job_id}')
+    return job_id
+
+def process_batch_async(items):
+    """Queue several validated inputs, skipping duplicates.
+
+    An input that can't be queued doesn't stop the rest of the batch; its
+    error is returned in place of a job id.
+
+    Args:
+        items: List of (content, original_url) tuples as returned by check_input
+
+    Returns:
+        List of (job_id, duplicate, error) tuples in the same order as items,
+        with job_id None and error set for inputs that couldn't be queued
+    """
+    results = []
+    queued = {}
+    new_urls = []
+    for content, original_url in items:
+        key = original_url or content
+        if key in queued:
+            results.append((queued[key], True, None))
+            continue
+
         try:
-            # Process the pre-validated content
-            processed = process_validated_input(content, original_url)
-
-            # Create the episode with all necessary information
-            output_path = create_episode(
-                text=processed['text'],
-                title=processed['title'],
-                description=processed['description'],
-                base_filename=processed['title'].lower().replace(' ', '-')[:50]  # Use title as base filename
-            )
-
-            if output_path:
-                logger.info(f'Successfully processed episode: {processed["title"]}')
+            job_id = db.find_active_job(original_url) if original_url else None
+            if job_id is not None:
+                results.append((job_id, True, None))
             else:
-                logger.error('Failed to create episode')
+                job_id = process_episode_async(content, original_url)
+                results.append((job_id, False, None))
+                if original_url:
+                    new_urls.append(original_url)
+        except Exception as e:
+            logger.error(f'Error queueing batch input: {str(e)}')
+            results.append((None, False, str(e)))
+            continue
+        queued[key] = job_id
+
+    # Fetch the pages in parallel; workers reaching a page still in flight share its fetch
+    if new_urls:
+        prefetch_urls(new_urls)
+
+    return results
+
+def get_job_status(job_id):
+    """Describe a job's progress for API clients, or return None if it doesn't exist."""
+    job = db.get_job(job_id)
+    if job is None:
+        return None
+
+    status = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': round(STAGES.index(job['stage']) / (len(STAGES) - 1), 2),
+        'attempts': job['attempts'],
+        'tokens_saved': job['tokens_saved'],
+        'timeline': json.loads(job['timeline']) if job['timeline'] else [],
+        'title': job['title'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['status'] == 'done' and job['audio_path']:
+        status['episode_url'] = f"{BASE_URL}/static/audio/{Path(job['audio_path']).name}"
+    return status
+
+def start_workers(count=JOB_WORKERS):
+    """Start the fixed-size worker pool, resuming jobs interrupted by a restart."""
+    with _workers_lock:
+        if _workers:
+            return
+
+        requeued = db.requeue_running_jobs()
+        if requeued:
+            logger.info(f'Resuming {requeued} interrupted job(s)')
+
+        for i in range(max(1, count)):
+            worker = threading.Thread(target=_worker_loop, name=f'job-worker-{i}')
+            worker.daemon = True  # Unfinished jobs are resumed on next start
+            worker.start()
+            _workers.append(worker)
+
+def _worker_loop():
+    """Claim and process queued jobs until the program exits."""
+    while True:
+        job = db.claim_next_job()
+        if job is None:
+            with _wakeup:
+                _wakeup.wait(timeout=JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            with JOBS_IN_FLIGHT.track():
+                _run_job(job)
         except Exception as e:
-            logger.error(f'Error in background processing: {str(e)}')
+            logger.error(f'Error in background processing of job {job["id"]}: {str(e)}')
+            _fail_job(job, str(e))
+
+def _fail_job(job, error, retry=True):
+    """Requeue a failed job, or mark it failed once it has used all its attempts."""
+    if retry and job['attempts'] < JOB_MAX_ATTEMPTS:
+        db.update_job(job['id'], status='queued', error=error)
+        JOBS_FINISHED.inc(outcome='retried')
+    else:
+        db.update_job(job['id'], status='failed', error=error)
+        JOBS_FINISHED.inc(outcome='failed')
+        logger.error(f'Job {job["id"]} failed after {job["attempts"]} attempts')
+
+@contextmanager
+def _timed_stage(job, stage):
+    """Time a pipeline stage for the metrics and append it to the job's timeline."""
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        job['timeline'].append({'stage': stage, 'started': round(started, 3), 'seconds': round(seconds, 3)})
+        db.update_job(job['id'], timeline=json.dumps(job['timeline']))
+
+def _episode_basename(title):
+    """Base filename for an episode's audio, derived from its title."""
+    return title.lower().replace(' ', '-')[:50]
+
+def _clean_and_synthesize(job, text):
+    """Clean a long article in chunks, synthesizing each chunk as soon as it is cleaned.
+
+    Synthesis starts before the title exists, so the file is renamed after the
+    title once it's known, like every other episode.
+    Advances the job to 'combined', or to 'titled' if synthesis failed.
+    Returns the CombinedAudio, or None on failure.
+    """
+    job_id = job['id']
+    cleaned_chunks = []
+    pending = {}
+
+    def record(chunks):
+        for chunk in chunks:
+            if not cleaned_chunks:
+                # Title and summary only look at the start of the article
+                pending['title'] = llm_executor.submit(generate_title, chunk)
+                pending['summary'] = llm_executor.submit(generate_summary, chunk)
+            cleaned_chunks.append(chunk)
+            yield chunk
+
+    logger.info(f'Job {job_id}: cleaning and synthesizing in chunks')
+    combined = synthesize_episode_stream(record(clean_text_chunks(text)), f'job-{job_id}', ensure_temp_directory())
+
+    text = '\n\n'.join(cleaned_chunks)
+    title = pending['title'].result()
+    description = build_description(pending['summary'].result(), job['original_url'])
+    db.update_job(job_id, stage='titled', text=text, title=title, description=description)
+    job.update(stage='titled', text=text, title=title, description=description)
+    if combined is None:
+        return None
+
+    final_path = create_filename(_episode_basename(title), combined.path.suffix.lstrip('.'), is_final=True)
+    combined.path.rename(final_path)
+    combined = combined._replace(path=final_path)
+    db.update_job(job_id, stage='combined', audio_path=str(combined.path))
+    job.update(stage='combined', audio_path=str(combined.path))
+    return combined
+
+def _run_job(job):
+    """Advance a job from its recorded stage through to publication."""
+    job_id = job['id']
+    original_url = job['original_url']
+    # Stage timings, kept across attempts
+    job['timeline'] = json.loads(job.get('timeline') or '[]')
+    # Measured while combining; a job resumed after combining measures the file instead
+    audio_info = None
+
+    if job['stage'] == 'submitted':
+        logger.info(f'Job {job_id}: fetching {original_url}')
+        try:
+            with _timed_stage(job, 'fetch'):
+                content = fetch_url_content(original_url)
+        except requests.HTTPError as e:
+            # Client errors (404, 403, ...) won't fix themselves on retry
+            status_code = e.response.status_code if e.response is not None else 500
+            return _fail_job(job, f'Error fetching URL: {str(e)}', retry=status_code >= 500 or status_code == 429)
+        except ValueError as e:
+            return _fail_job(job, str(e), retry=False)
+        db.update_job(job_id, stage='fetched', content=content)
+        job.update(stage='fetched', content=content)
+
+    if job['stage'] == 'fetched':
+        with _timed_stage(job, 'extract'):
+            text, needs_cleanup, tokens_saved = extract_content(job['content'], original_url)
+        db.update_job(job_id, tokens_saved=tokens_saved)
+        if not needs_cleanup:
+            db.update_job(job_id, stage='cleaned', text=text)
+            job.update(stage='cleaned', text=text)
+        elif len(text) > CLEANUP_CHUNK_SIZE:
+            # Long article: overlap chunked cleanup with synthesis
+            with _timed_stage(job, 'clean_and_synthesize'):
+                combined = _clean_and_synthesize(job, text)
+            if not combined:
+                return _fail_job(job, 'Failed to synthesize audio segments')
+            audio_info = combined.info
+        else:
+            logger.info(f'Job {job_id}: cleaning text')
+            with _timed_stage(job, 'cleanup'):
+                text = clean_text_with_gpt(text)
+            db.update_job(job_id, stage='cleaned', text=text)
+            job.update(stage='cleaned', text=text)
+
+    if job['stage'] == 'cleaned':
+        logger.info(f'Job {job_id}: generating title and summary')
+        with _timed_stage(job, 'describe'):
+            results, _ = run_stages({
+                'title': (lambda: generate_title(job['text']), ()),
+                'summary': (lambda: generate_summary(job['text']), ()),
+            })
+        title = results['title']
+        description = build_description(results['summary'], original_url)
+        db.update_job(job_id, stage='titled', title=title, description=description)
+        job.update(stage='titled', title=title, description=description)
+
+    base_filename = _episode_basename(job['title'])
+
+    if job['stage'] == 'titled':
+        segments = split_text(job['text'])
+        logger.info(f'Job {job_id}: synthesizing {len(segments)} segments')
+        with _timed_stage(job, 'synthesize'):
+            combined = synthesize_episode(segments, base_filename, ensure_temp_directory())
+        if not combined:
+            return _fail_job(job, 'Failed to synthesize audio segments')
+        audio_info = combined.info
+        db.update_job(job_id, stage='combined', audio_path=str(combined.path))
+        job.update(stage='combined', audio_path=str(combined.path))
+
+    if job['stage'] == 'combined':
+        with _timed_stage(job, 'publish'):
+            published = publish_episode(Path(job['audio_path']), job['title'], job['description'],
+                                        audio_info, json.dumps(job['timeline']))
+        if not published:
+            return _fail_job(job, 'Failed to save episode to database')
+        db.update_job(job_id, stage='published')
+        job['stage'] = 'published'
 
-    # Start processing in background thread
-    thread = threading.Thread(target=_process)
-    thread.daemon = True  # Thread will be terminated when main program exits
-    thread.start()
+    db.update_job(job_id, status='done', error=None)
+    JOBS_FINISHED.inc(outcome='done')
+    logger.info(f'Successfully processed episode: {job["title"]}')
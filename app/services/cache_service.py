@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from pathlib import Path
+from config.config import (
+    CACHE_PATH,
+    CONTENT_CACHE_MAX_BYTES,
+    CONTENT_CACHE_TTL,
+    SEGMENT_CACHE_PATH,
+    SEGMENT_CACHE_MAX_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+def make_key(*parts):
+    """Build a content-addressed cache key from its parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class DiskCache:
+    """On-disk cache with a size limit, least-recently-used eviction and a TTL.
+
+    Entries are files named by key. A file's mtime records when it was
+    written (for the TTL) and its atime when it was last read (for LRU).
+    """
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = None  # Computed on first write
+
+    def _path(self, key):
+        return self.directory / key[:2] / key
+
+    def _entries(self):
+        return [path for path in self.directory.glob('*/*') if path.is_file() and not path.name.startswith('.')]
+
+    def get_path(self, key, ttl=None):
+        """Return the path of a fresh entry, marking it as recently used, or None."""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and time.time() - stat.st_mtime > ttl:
+            return None
+
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+        return path
+
+    def get_bytes(self, key, ttl=None):
+        """Return the cached bytes for a key, or None."""
+        path = self.get_path(key, ttl)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def get(self, key, ttl=None):
+        """Return the cached JSON value for a key, or None."""
+        data = self.get_bytes(key, ttl)
+        return json.loads(data) if data is not None else None
+
+    def set_bytes(self, key, data):
+        """Store bytes under a key."""
+        self._store(key, lambda tmp_path: tmp_path.write_bytes(data))
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under a key."""
+        self.set_bytes(key, json.dumps(value).encode('utf-8'))
+
+    def put_file(self, key, source_path):
+        """Store a copy of a file under a key and return the cached path."""
+        self._store(key, lambda tmp_path: shutil.copyfile(source_path, tmp_path))
+        return self._path(key)
+
+    def _store(self, key, write):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary name first so readers never see partial entries
+            tmp_path = path.parent / f'.{key}.{uuid.uuid4().hex[:6]}'
+            write(tmp_path)
+            new_size = tmp_path.stat().st_size
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f'Error writing cache entry {key}: {str(e)}')
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._size += new_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is under 90% of its limit."""
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.stat(), entry))
+            except FileNotFoundError:
+                continue
+        entries.sort(key=lambda item: item[0].st_atime)
+
+        size = sum(stat.st_size for stat, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for stat, entry in entries:
+            if size <= target:
+                break
+            try:
+                entry.unlink()
+                size -= stat.st_size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        self._size = size
+        logger.info(f'Evicted {removed} entries from cache {self.directory.name}')
+
+# Cache for fetched pages and the results of each content processing stage
+content_cache = DiskCache(CACHE_PATH / 'content', CONTENT_CACHE_MAX_BYTES, CONTENT_CACHE_TTL)
+
+# Cache for synthesized TTS segments; entries don't expire, only get evicted
+segment_cache = DiskCache(SEGMENT_CACHE_PATH, SEGMENT_CACHE_MAX_BYTES)
@@ -1,15 +1,33 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from lxml import etree, html as lxml_html
 import logging
 import re
 import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from config.config import (
     CONTENT_CLEANUP_MODEL,
-    TITLE_GENERATION_MODEL
+    TITLE_GENERATION_MODEL,
+    LLM_CONCURRENCY,
+    CLEANUP_CHUNK_SIZE,
+    URL_CACHE_TTL,
+    FETCH_CONNECT_TIMEOUT,
+    FETCH_READ_TIMEOUT,
+    FETCH_TOTAL_TIMEOUT,
+    FETCH_MAX_BYTES,
+    FETCH_CONCURRENCY,
+    HTML_SKIP_CLEANUP_CONFIDENCE,
+    CLEANUP_POLICY
 )
 from .database_service import db
+from .cache_service import content_cache, make_key
+from .metrics_service import API_SECONDS, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +38,20 @@ load_dotenv()
 from openai import OpenAI
 client = OpenAI()
 
+# Shared pool for pipeline stages, bounding concurrent GPT calls across all jobs
+llm_executor = ThreadPoolExecutor(max_workers=max(1, LLM_CONCURRENCY), thread_name_prefix='llm')
+
+# Separate pool for cleanup chunks, which are awaited from inside llm_executor stages
+cleanup_executor = ThreadPoolExecutor(max_workers=max(1, LLM_CONCURRENCY), thread_name_prefix='llm-cleanup')
+
+# Shared HTTP session so fetches reuse keep-alive connections
+http_session = requests.Session()
+http_session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+http_adapter = HTTPAdapter(pool_connections=FETCH_CONCURRENCY, pool_maxsize=FETCH_CONCURRENCY)
+http_session.mount('http://', http_adapter)
+http_session.mount('https://', http_adapter)
+fetch_executor = ThreadPoolExecutor(max_workers=max(1, FETCH_CONCURRENCY), thread_name_prefix='fetch')
+
 def is_url(text):
     """Check if the input is a URL."""
     url_pattern = re.compile(
@@ -31,26 +63,142 @@ def is_url(text):
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
     return url_pattern.match(text) is not None
 
+def iter_body(response, chunk_size=64 * 1024):
+    """Yield a streamed response body as it arrives.
+
+    iter_content waits for each chunk to fill, so a server sending a byte at a
+    time never yields control. urllib3 2's read1 returns whatever has arrived.
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    while True:
+        try:
+            chunk = read1(chunk_size, decode_content=True)
+        except Urllib3Error as e:
+            raise requests.ConnectionError(e)
+        if not chunk:
+            return
+        yield chunk
+
+def read_limited(response, max_bytes=FETCH_MAX_BYTES, deadline=None):
+    """Read a streamed response body as text, refusing bodies larger than max_bytes.
+
+    Raises ValueError if the body is too large or still arriving at deadline (time.monotonic()).
+    """
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ValueError(f'Page exceeds maximum size of {max_bytes / 1024 / 1024:.1f}MB')
+
+    chunks = []
+    received = 0
+    for chunk in iter_body(response):
+        if deadline is not None and time.monotonic() > deadline:
+            raise ValueError(f'Page took longer than {FETCH_TOTAL_TIMEOUT:.0f}s to download')
+        received += len(chunk)
+        if received > max_bytes:
+            raise ValueError(f'Page exceeds maximum size of {max_bytes / 1024 / 1024:.1f}MB')
+        chunks.append(chunk)
+    body = b''.join(chunks)
+
+    # Use the declared charset, otherwise assume UTF-8 and fall back to Latin-1
+    if 'charset' in response.headers.get('Content-Type', '').lower() and response.encoding:
+        return body.decode(response.encoding, errors='replace')
+    try:
+        return body.decode('utf-8')
+    except UnicodeDecodeError:
+        return body.decode('iso-8859-1')
+
+# Prefetches in progress by URL, so a worker fetching the same page waits for it instead
+_inflight_fetches = {}
+_inflight_lock = threading.Lock()
+
 def fetch_url_content(url):
-    """Fetch content from a URL with a browser User-Agent."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
+    """Fetch content from a URL with a browser User-Agent.
+
+    Pages fetched within URL_CACHE_TTL are served from the cache. Older cached
+    pages are revalidated with a conditional GET using their ETag/Last-Modified.
+    A page already being prefetched is waited for rather than fetched again.
+    Raises ValueError if the page is larger than FETCH_MAX_BYTES or takes longer
+    than FETCH_TOTAL_TIMEOUT to download.
+    """
+    with _inflight_lock:
+        future = _inflight_fetches.get(url)
+    if future is not None:
+        return future.result()
+    return download_page(url)
+
+def download_page(url):
+    """Fetch a page through the URL cache, for fetch_url_content and prefetch_urls."""
+    cache_key = make_key('fetch', url)
+    cached = content_cache.get(cache_key)
+    if cached is not None and time.time() - cached.get('fetched_at', 0) < URL_CACHE_TTL:
+        logger.info(f'Using cached content for {url}')
+        return cached['content']
+
+    headers = {}
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    # The read timeout only bounds the gap between bytes; this bounds the whole download
+    deadline = time.monotonic() + FETCH_TOTAL_TIMEOUT
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.text
+        with http_session.get(url, headers=headers, stream=True,
+                              timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT)) as response:
+            if response.status_code == 304 and cached is not None:
+                logger.info(f'Cached content for {url} is still current')
+                cached['fetched_at'] = time.time()
+                content_cache.set(cache_key, cached)
+                return cached['content']
+
+            response.raise_for_status()
+            content = read_limited(response, deadline=deadline)
+            content_cache.set(cache_key, {
+                'content': content,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time()
+            })
+            return content
     except requests.RequestException as e:
         logger.error(f'Error fetching URL {url}: {str(e)}')
         raise
 
+def prefetch_urls(urls):
+    """Start fetching URLs in the background without waiting for them.
+
+    Each page is fetched by its own task on fetch_executor. Later
+    fetch_url_content calls for a page still in flight share its result.
+    """
+    for url in dict.fromkeys(urls):
+        with _inflight_lock:
+            if url in _inflight_fetches:
+                continue
+            future = fetch_executor.submit(download_page, url)
+            _inflight_fetches[url] = future
+        future.add_done_callback(lambda done, url=url: _finish_prefetch(url, done))
+
+def _finish_prefetch(url, future):
+    """Forget a finished prefetch; its page is in the URL cache if it succeeded."""
+    with _inflight_lock:
+        if _inflight_fetches.get(url) is future:
+            del _inflight_fetches[url]
+
 # Constants for size limits
 MAX_URL_LENGTH = 2048  # Standard browser URL length limit
 MAX_INPUT_SIZE = 100 * 1024  # 100KB for direct text input
 MAX_CONTENT_INFLATION = 1.2  # Maximum 20% increase from GPT processing
 
-def validate_input(input_text):
-    """Validate input and fetch URL content if necessary."""
+def check_input(input_text):
+    """Validate input without fetching anything.
+
+    Returns:
+        Tuple of (text, None) for text input or (None, url) for URL input
+    """
     if not input_text or not input_text.strip():
         raise ValueError('Input text is empty')
 
@@ -65,39 +213,123 @@ def validate_input(input_text):
         # Check URL length
         if len(input_text) > MAX_URL_LENGTH:
             raise ValueError(f'URL exceeds maximum length of {MAX_URL_LENGTH} characters')
-        # Fetch and return the raw HTML content
-        return fetch_url_content(input_text), input_text
+        return None, input_text
 
     return input_text, None
 
-def clean_html_content(html_content):
-    """Clean HTML content and extract readable text."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def validate_input(input_text):
+    """Validate input and fetch URL content if necessary."""
+    text, url = check_input(input_text)
+    if url:
+        # Fetch and return the raw HTML content
+        return fetch_url_content(url), url
 
-    # Remove script and style elements
-    for element in soup(['script', 'style', 'header', 'footer', 'nav']):
-        element.decompose()
+    return text, None
 
-    # Get text while preserving some structure
-    paragraphs = []
+# Elements whose text is never part of the article
+NOISE_TAGS = ('script', 'style', 'noscript', 'header', 'footer', 'nav')
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+BLOCK_TAGS = HEADING_TAGS + ('p',)
 
-    # Process headings
-    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-        text = heading.get_text(strip=True)
-        if text:
-            paragraphs.append(text)
+# Extracted article text and how confident we are that it is only the article
+Article = namedtuple('Article', 'text confidence')
 
-    # Process paragraphs
-    for para in soup.find_all('p'):
-        text = para.get_text(strip=True)
-        if text:
-            paragraphs.append(text)
+def parse_html(html_content):
+    """Parse an HTML document with lxml, or return None if there is nothing to parse."""
+    # lxml stops reading at the first NUL, silently dropping the rest of the page
+    html_content = html_content.replace('\x00', '')
+    try:
+        return lxml_html.document_fromstring(html_content)
+    except ValueError:
+        # Unicode strings with an XML encoding declaration must be parsed as bytes
+        parser = lxml_html.HTMLParser(encoding='utf-8')
+        return lxml_html.document_fromstring(html_content.encode('utf-8'), parser=parser)
+    except etree.ParserError:
+        return None
+
+def link_density(element):
+    """Fraction of an element's text that is inside links."""
+    text_length = len(element.text_content())
+    if not text_length:
+        return 1.0
+    link_length = sum(len(link.text_content()) for link in element.iter('a'))
+    return link_length / text_length
+
+def extract_article(html_content):
+    """Extract article text from HTML in a single, document-order pass.
+
+    Paragraphs score their parent (and half to their grandparent) by length
+    and comma count, readability-style. If the best-scoring container holds
+    most of the page's paragraph text, only its headings and paragraphs are
+    kept, along with any h1 titles outside it. Confidence combines that share
+    with the container's link density.
+    """
+    cache_key = make_key('article', html_content)
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        return Article(*cached)
+
+    tree = parse_html(html_content)
+    if tree is None:
+        return Article('', 0.0)
+    etree.strip_elements(tree, *NOISE_TAGS, with_tail=False)
+
+    blocks = []
+    scores = {}
+    for element in tree.iter(*BLOCK_TAGS):
+        text = ' '.join(element.text_content().split())
+        if not text:
+            continue
+        blocks.append((element, text))
+
+        if element.tag == 'p' and len(text) >= 25:
+            score = 1 + text.count(',') + min(len(text) // 100, 3)
+            parent = element.getparent()
+            if parent is not None:
+                scores[parent] = scores.get(parent, 0) + score
+                grandparent = parent.getparent()
+                if grandparent is not None:
+                    scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+    confidence = 0.0
+    if scores:
+        densities = {element: link_density(element) for element in scores}
+        candidate = max(scores, key=lambda element: scores[element] * (1 - densities[element]))
+        in_candidate = set(candidate.iter(*BLOCK_TAGS))
+
+        paragraph_total = sum(len(text) for element, text in blocks if element.tag == 'p')
+        paragraph_main = sum(len(text) for element, text in blocks if element.tag == 'p' and element in in_candidate)
+        share = paragraph_main / paragraph_total if paragraph_total else 0.0
+
+        if share >= 0.5:
+            blocks = [(element, text) for element, text in blocks
+                      if element in in_candidate or element.tag == 'h1']
+            confidence = (1 - densities[candidate]) * min(1.0, share / 0.8)
 
     # Join with double newlines to maintain paragraph separation
-    return '\n\n'.join(paragraphs)
+    article = Article('\n\n'.join(text for _, text in blocks), round(confidence, 3))
+    content_cache.set(cache_key, list(article))
+    return article
+
+def clean_html_content(html_content):
+    """Clean HTML content and extract readable text."""
+    return extract_article(html_content).text
+
+def record_usage(stage, response):
+    """Count the tokens used by a GPT response."""
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens, stage=stage, kind='prompt')
+        LLM_TOKENS.inc(usage.completion_tokens, stage=stage, kind='completion')
 
 def clean_text_with_gpt(text):
     """Use GPT to clean and format the text content."""
+    cache_key = make_key('clean', CONTENT_CLEANUP_MODEL, text)
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        logger.info('Using cached GPT cleanup')
+        return cached
+
     # Get initial text size for inflation check
     initial_size = len(text.encode('utf-8'))
     """Use GPT to clean and format the text content."""
@@ -123,12 +355,14 @@ def clean_text_with_gpt(text):
     ]
 
     try:
-        response = client.chat.completions.create(
-            model=CONTENT_CLEANUP_MODEL,
-            messages=messages,
-            temperature=0.3,
-            top_p=1
-        )
+        with API_SECONDS.time(api='cleanup'):
+            response = client.chat.completions.create(
+                model=CONTENT_CLEANUP_MODEL,
+                messages=messages,
+                temperature=0.3,
+                top_p=1
+            )
+        record_usage('cleanup', response)
         cleaned_text = response.choices[0].message.content.strip()
 
         # Check for content inflation
@@ -137,13 +371,72 @@ def clean_text_with_gpt(text):
             logger.warning(f'GPT output exceeded inflation limit. Original: {initial_size}, Cleaned: {cleaned_size}')
             return text  # Return original text if inflation limit exceeded
 
+        content_cache.set(cache_key, cleaned_text)
         return cleaned_text
     except Exception as e:
         logger.error(f"Error cleaning text with GPT: {e}")
         return text
 
+def split_paragraph_chunks(text, size=CLEANUP_CHUNK_SIZE):
+    """Split text into chunks of up to size characters on paragraph boundaries."""
+    if len(text) <= size:
+        return [text]
+
+    chunks = []
+    current = []
+    current_length = 0
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        # Break up paragraphs that are too long on their own at word boundaries
+        pieces = []
+        while len(paragraph) > size:
+            split_index = paragraph.rfind(' ', 0, size)
+            if split_index <= 0:
+                split_index = size
+            pieces.append(paragraph[:split_index])
+            paragraph = paragraph[split_index:].lstrip()
+        pieces.append(paragraph)
+
+        for piece in pieces:
+            if current and current_length + len(piece) + 2 > size:
+                chunks.append('\n\n'.join(current))
+                current = []
+                current_length = 0
+            current.append(piece)
+            current_length += len(piece) + 2
+
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+def clean_text_chunks(text):
+    """Clean text with GPT in paragraph-aligned chunks.
+
+    All chunks are submitted for cleanup immediately. Returns an iterator that
+    yields cleaned chunks in order, each as soon as it is ready, so callers can
+    start using the beginning of the article while the rest is being cleaned.
+    The inflation limit in clean_text_with_gpt applies to each chunk.
+    """
+    chunks = split_paragraph_chunks(text)
+    if len(chunks) > 1:
+        logger.info(f'Cleaning text in {len(chunks)} chunks')
+    futures = [cleanup_executor.submit(clean_text_with_gpt, chunk) for chunk in chunks]
+    return (future.result() for future in futures)
+
+def clean_text_chunked(text):
+    """Clean text with GPT, splitting long articles into concurrently cleaned chunks."""
+    return '\n\n'.join(clean_text_chunks(text))
+
 def generate_title(text):
     """Generate a title for the content using GPT."""
+    cache_key = make_key('title', TITLE_GENERATION_MODEL, text[:300])
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     messages = [
         {
             "role": "system",
@@ -156,26 +449,37 @@ def generate_title(text):
     ]
 
     try:
-        response = client.chat.completions.create(
-            model=TITLE_GENERATION_MODEL,
-            messages=messages,
-            temperature=0.3,
-            max_tokens=20,
-            top_p=1,
-            stop=["\n"]
-        )
-        return response.choices[0].message.content.strip()
+        with API_SECONDS.time(api='title'):
+            response = client.chat.completions.create(
+                model=TITLE_GENERATION_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=20,
+                top_p=1,
+                stop=["\n"]
+            )
+        record_usage('title', response)
+        title = response.choices[0].message.content.strip()
+        content_cache.set(cache_key, title)
+        return title
     except Exception as e:
         logger.error(f"Error generating title: {e}")
         return "Untitled Episode"
 
-def save_episode_to_db(filename, title, description, duration=None):
+def save_episode_to_db(filename, title, description, duration=None, audio_info=None, timeline=None,
+                       renditions=None):
     """Save episode information to the database."""
     pub_date = datetime.now(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
-    return db.add_episode(filename, title, description, pub_date, duration=duration)
+    return db.add_episode(filename, title, description, pub_date, duration=duration,
+                          audio_info=audio_info, timeline=timeline, renditions=renditions)
 
 def generate_summary(text):
     """Generate a brief summary of the content using GPT."""
+    cache_key = make_key('summary', CONTENT_CLEANUP_MODEL, text[:1000])
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     messages = [
         {
             "role": "system",
@@ -188,50 +492,177 @@ def generate_summary(text):
     ]
 
     try:
-        response = client.chat.completions.create(
-            model=CONTENT_CLEANUP_MODEL,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=100,
-            top_p=1
-        )
-        return response.choices[0].message.content.strip()
+        with API_SECONDS.time(api='summary'):
+            response = client.chat.completions.create(
+                model=CONTENT_CLEANUP_MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=100,
+                top_p=1
+            )
+        record_usage('summary', response)
+        summary = response.choices[0].message.content.strip()
+        content_cache.set(cache_key, summary)
+        return summary
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
         return "No summary available"
 
-def process_validated_input(content, original_url=None):
-    """Process pre-validated input content."""
+# Short lines that are almost always page furniture rather than article text
+BOILERPLATE_LINE = re.compile(
+    r'^(share( this( article| story)?)?|tweet|print|email|subscribe( now)?|sign (up|in)|log ?in|'
+    r'advertisement|sponsored|accept( all)? cookies|we use cookies.*|read more|related( articles| stories)?|'
+    r'follow us.*|skip to (main )?content|\d+ comments?|comments)[.:!]?$',
+    re.IGNORECASE
+)
+
+# Signs that text still contains markup or code that GPT cleanup would remove
+MARKUP_PATTERN = re.compile(r'<[a-zA-Z/!][^>]*>|&[a-zA-Z]+;|\bfunction\s*\(|\{[^{}]*:[^{}]*;[^{}]*\}')
+
+# Approximate size of the cleanup system prompt, in tokens
+CLEANUP_PROMPT_TOKENS = 300
+
+# Result of local preprocessing: text plus whether GPT cleanup should run
+Extracted = namedtuple('Extracted', 'text needs_cleanup tokens_saved')
+
+def estimate_tokens(text):
+    """Roughly estimate the token count of English text (about 4 characters per token)."""
+    return (len(text) + 3) // 4
+
+def preprocess_text(text):
+    """Strip boilerplate lines and collapse whitespace without calling GPT."""
+    lines = []
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        if len(line) < 60 and BOILERPLATE_LINE.match(line):
+            continue
+        lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+def looks_clean(text):
+    """Heuristically decide whether plain text is already free of web debris."""
+    if MARKUP_PATTERN.search(text):
+        return False
+
+    lines = [line for line in text.split('\n') if line]
+    if not lines:
+        return True
+
+    # Navigation and link lists show up as many short lines without sentence punctuation
+    fragments = sum(1 for line in lines if len(line) < 40 and not line.endswith(('.', '!', '?', ':', '"')))
+    return fragments / len(lines) <= 0.3
+
+def extract_content(content, original_url=None):
+    """Extract readable text from pre-validated content and decide whether it needs GPT cleanup.
+
+    The decision follows CLEANUP_POLICY: 'always' or 'never' clean, or 'auto',
+    which skips cleanup for pages extracted with at least
+    HTML_SKIP_CLEANUP_CONFIDENCE and for plain text that already looks clean.
+
+    Returns:
+        Extracted(text, needs_cleanup, tokens_saved), where tokens_saved estimates
+        the GPT tokens avoided by preprocessing or skipping cleanup
+    """
     # If content is HTML (from URL), clean it
     if original_url:
         logger.info('Processing URL content')
-        text = clean_html_content(content)
+        article = extract_article(content)
+        raw_text = article.text
+        confident = article.confidence >= HTML_SKIP_CLEANUP_CONFIDENCE
     else:
         logger.info('Processing raw text input')
-        text = content
+        raw_text = content
+        confident = False
 
-    # Clean the text with GPT
-    logger.info('Cleaning text with GPT')
-    cleaned_text = clean_text_with_gpt(text)
+    text = preprocess_text(raw_text)
 
-    # Generate title
-    logger.info('Generating title')
-    title = generate_title(cleaned_text)
+    if CLEANUP_POLICY == 'always':
+        needs_cleanup = True
+    elif CLEANUP_POLICY == 'never':
+        needs_cleanup = False
+    elif original_url:
+        needs_cleanup = not confident
+    else:
+        needs_cleanup = not looks_clean(text)
+
+    # Cleanup sends the text and gets about as much back
+    if needs_cleanup:
+        tokens_saved = 2 * (estimate_tokens(raw_text) - estimate_tokens(text))
+    else:
+        tokens_saved = CLEANUP_PROMPT_TOKENS + 2 * estimate_tokens(raw_text)
+        logger.info(f'Skipping GPT cleanup ({CLEANUP_POLICY} policy), about {tokens_saved} tokens saved')
 
-    # Generate summary for description
-    logger.info('Generating summary')
-    summary = generate_summary(cleaned_text)
+    return Extracted(text, needs_cleanup, tokens_saved)
 
-    # Create description based on input type
+def extract_text(content, original_url=None):
+    """Extract readable text from pre-validated content."""
+    return extract_content(content, original_url)[0]
+
+def build_description(summary, original_url=None):
+    """Create the episode description based on input type."""
     if original_url:
-        description = f"From URL: {original_url}\n\n\n{summary}"
-    else:
-        description = summary
+        return f"From URL: {original_url}\n\n\n{summary}"
+    return summary
+
+def run_stages(stages):
+    """Run a dependency graph of stages, starting each one as soon as its inputs are ready.
+
+    Args:
+        stages: Dict mapping stage name to (function, dependency names). Each function
+            is called with the results of its dependencies, in order.
+
+    Returns:
+        Tuple of (results, timings) dicts keyed by stage name, timings in seconds
+    """
+    results = {}
+    timings = {}
+
+    def timed(name, func, args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    pending = {}
+    remaining = dict(stages)
+    while remaining or pending:
+        # Start every stage whose dependencies have finished
+        for name, (func, deps) in list(remaining.items()):
+            if all(dep in results for dep in deps):
+                args = [results[dep] for dep in deps]
+                pending[llm_executor.submit(timed, name, func, args)] = name
+                del remaining[name]
+
+        if not pending:
+            raise ValueError(f"Unsatisfiable stage dependencies: {', '.join(remaining)}")
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+
+    return results, timings
+
+def process_validated_input(content, original_url=None):
+    """Process pre-validated input content.
+
+    Title and summary generation only depend on the cleaned text, so they run
+    concurrently once cleanup finishes.
+    """
+    results, timings = run_stages({
+        'extract': (lambda: extract_content(content, original_url), ()),
+        'clean': (lambda extracted: clean_text_chunked(extracted.text) if extracted.needs_cleanup else extracted.text, ('extract',)),
+        'title': (generate_title, ('clean',)),
+        'summary': (generate_summary, ('clean',)),
+    })
+    logger.info('Content stage timings: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items()))
 
     return {
-        'text': cleaned_text,
-        'title': title,
-        'description': description
+        'text': results['clean'],
+        'title': results['title'],
+        'description': build_description(results['summary'], original_url),
+        'tokens_saved': results['extract'].tokens_saved,
+        'timings': timings
     }
 
 def process_input(input_text):
@@ -1,61 +1,291 @@
 import sqlite3
 import os
+import base64
 import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from markupsafe import escape
+from config.config import DATA_PATH, DB_BUSY_TIMEOUT, DB_MMAP_SIZE
 
 logger = logging.getLogger(__name__)
 
+def encode_cursor(created_at, episode_id):
+    """Encode an episode's sort key as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(f'{created_at}|{episode_id}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor into (created_at, id). Raises ValueError if invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, episode_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return created_at, int(episode_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def description_to_html(description):
+    """Render a plain-text episode description as HTML with line breaks."""
+    text = description.strip().replace('\r\n', '\n').replace('\r', '\n').replace('\n\n', '\n')
+    return str(escape(text)).replace('\n', '<br>')
+
+def pub_date_timestamp(pub_date):
+    """Convert an RFC 2822 publication date to a Unix timestamp."""
+    return int(parsedate_to_datetime(pub_date).timestamp())
+
+def add_display_columns(conn):
+    """Add precomputed home page fields and fill them in for existing episodes."""
+    conn.execute('ALTER TABLE episodes ADD COLUMN description_html TEXT')
+    conn.execute('ALTER TABLE episodes ADD COLUMN published_at INTEGER')
+    rows = conn.execute('SELECT id, description, pub_date FROM episodes').fetchall()
+    conn.executemany(
+        'UPDATE episodes SET description_html = ?, published_at = ? WHERE id = ?',
+        [(description_to_html(description), pub_date_timestamp(pub_date), episode_id)
+         for episode_id, description, pub_date in rows]
+    )
+
+def add_change_tracking(conn):
+    """Count changes to episodes and renditions in the database itself.
+
+    Triggers bump the counter in the writing transaction, so caches in every
+    process (the server, maintenance commands) see each other's changes.
+    """
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS episode_changes (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL,
+               changed_at INTEGER NOT NULL
+           )'''
+    )
+    conn.execute(
+        '''INSERT INTO episode_changes (id, version, changed_at)
+           SELECT 1, 0, COALESCE(CAST(strftime('%s', MAX(created_at)) AS INTEGER),
+                                 CAST(strftime('%s', 'now') AS INTEGER))
+           FROM episodes'''
+    )
+    for table in ('episodes', 'episode_renditions'):
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(
+                f'''CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_changed
+                    AFTER {operation} ON {table}
+                    BEGIN
+                        UPDATE episode_changes
+                        SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER);
+                    END'''
+            )
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each entry is a sequence of SQL statements or a callable taking the
+# connection. Never edit an entry once released; append a new one instead.
+MIGRATIONS = [
+    # 1: Episodes table
+    (
+        '''CREATE TABLE IF NOT EXISTS episodes (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               filename TEXT NOT NULL,
+               title TEXT NOT NULL,
+               description TEXT NOT NULL,
+               pub_date TEXT NOT NULL,
+               duration TEXT,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+    ),
+    # 2: Index for newest-first listing and keyset pagination
+    (
+        'CREATE INDEX IF NOT EXISTS idx_episodes_created_at ON episodes (created_at DESC, id DESC)',
+    ),
+    # 3: Jobs table for the background processing queue
+    (
+        '''CREATE TABLE IF NOT EXISTS jobs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               status TEXT NOT NULL DEFAULT 'queued',
+               stage TEXT NOT NULL,
+               original_url TEXT,
+               content TEXT,
+               text TEXT,
+               title TEXT,
+               description TEXT,
+               audio_path TEXT,
+               attempts INTEGER NOT NULL DEFAULT 0,
+               error TEXT,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)',
+    ),
+    # 4: Look up in-flight jobs by URL to avoid duplicate submissions
+    (
+        'CREATE INDEX IF NOT EXISTS idx_jobs_original_url ON jobs (original_url)',
+    ),
+    # 5: Estimated GPT tokens avoided by local preprocessing
+    (
+        'ALTER TABLE jobs ADD COLUMN tokens_saved INTEGER',
+    ),
+    # 6: Audio file properties recorded at export, so listings never read the files
+    (
+        'ALTER TABLE episodes ADD COLUMN duration_seconds REAL',
+        'ALTER TABLE episodes ADD COLUMN size_bytes INTEGER',
+        'ALTER TABLE episodes ADD COLUMN bitrate INTEGER',
+        'ALTER TABLE episodes ADD COLUMN sha256 TEXT',
+    ),
+    # 7: Home page fields rendered once at insert
+    add_display_columns,
+    # 8: Per-stage timings recorded while a job runs and kept with its episode
+    (
+        'ALTER TABLE jobs ADD COLUMN timeline TEXT',
+        'ALTER TABLE episodes ADD COLUMN timeline TEXT',
+    ),
+    # 9: Alternate encodings of each episode (AUDIO_RENDITIONS)
+    (
+        '''CREATE TABLE IF NOT EXISTS episode_renditions (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               episode_id INTEGER NOT NULL REFERENCES episodes (id),
+               profile TEXT NOT NULL,
+               filename TEXT NOT NULL,
+               mimetype TEXT NOT NULL,
+               duration_seconds REAL,
+               size_bytes INTEGER,
+               bitrate INTEGER,
+               sha256 TEXT,
+               UNIQUE (episode_id, profile)
+           )''',
+    ),
+    # 10: Episode change counter shared by every process
+    add_change_tracking,
+]
+
 class DatabaseService:
+    # Job columns that workers may update as a job moves through its stages
+    JOB_COLUMNS = {'status', 'stage', 'content', 'text', 'title', 'description',
+                   'audio_path', 'error', 'tokens_saved', 'timeline'}
+
     def __init__(self):
         # Ensure data directory exists relative to project root
-        self.data_dir = Path('data')
-        self.data_dir.mkdir(exist_ok=True)
+        self.data_dir = DATA_PATH
+        self.data_dir.mkdir(parents=True, exist_ok=True)
 
         # Set database path
         self.db_path = self.data_dir / 'hypercast.db'
 
+        # One connection per thread, shared by waitress and background workers
+        self._local = threading.local()
+
         # Initialize database if it doesn't exist
         self._initialize_db()
 
+    def _get_connection(self):
+        """Return this thread's connection, opening and tuning it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT * 1000)}')
+            conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+            self._local.conn = conn
+        return conn
+
     def _initialize_db(self):
-        """Initialize the database and create tables if they don't exist."""
+        """Initialize the database and apply any pending schema migrations."""
         try:
             # Create new database with proper permissions
             if not self.db_path.exists():
                 self.db_path.touch(mode=0o600)
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            while True:
+                # Lock before reading the version so concurrent processes migrate once
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    version = conn.execute('PRAGMA user_version').fetchone()[0]
+                    if version >= len(MIGRATIONS):
+                        conn.rollback()
+                        break
 
-                # Create episodes table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS episodes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        filename TEXT NOT NULL,
-                        title TEXT NOT NULL,
-                        description TEXT NOT NULL,
-                        pub_date TEXT NOT NULL,
-                        duration TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+                    migration = MIGRATIONS[version]
+                    if callable(migration):
+                        migration(conn)
+                    else:
+                        for statement in migration:
+                            conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version = {version + 1}')
+                    conn.commit()
+                    logger.info(f"Applied database migration {version + 1}")
+                except Exception:
+                    conn.rollback()
+                    raise
 
-                conn.commit()
-                logger.info("Database initialized successfully")
+            logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing database: {str(e)}")
             raise
 
-    def add_episode(self, filename: str, title: str, description: str, pub_date: str, duration: str = None) -> bool:
-        """Add a new episode to the database."""
+    def _read_changes(self):
+        """Return (version, changed_at) from the episode change counter."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
+                version, changed_at = conn.execute(
+                    'SELECT version, changed_at FROM episode_changes WHERE id = 1'
+                ).fetchone()
+                return version, datetime.fromtimestamp(changed_at, timezone.utc)
+        except Exception as e:
+            logger.error(f"Error reading episode changes: {str(e)}")
+            # Unknown; a version equal to nothing else makes caches rebuild
+            return object(), datetime.now(timezone.utc).replace(microsecond=0)
+
+    @property
+    def version(self):
+        """Counter bumped whenever episodes change in any process, so caches know when to rebuild."""
+        return self._read_changes()[0]
+
+    @property
+    def changed_at(self):
+        """When episodes last changed."""
+        return self._read_changes()[1]
+
+    def invalidate_caches(self):
+        """Bump the change counter so caches keyed on version rebuild, without changing an episode."""
+        with self._get_connection() as conn:
+            conn.execute(
+                '''UPDATE episode_changes
+                   SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)'''
+            )
+            conn.commit()
+
+    @staticmethod
+    def _insert_renditions(cursor, episode_id, renditions):
+        """Insert or replace an episode's renditions within the caller's transaction."""
+        cursor.executemany(
+            '''INSERT OR REPLACE INTO episode_renditions
+                   (episode_id, profile, filename, mimetype, duration_seconds, size_bytes, bitrate, sha256)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            [(episode_id, rendition.profile.name, rendition.path.name, rendition.mimetype, *rendition.info)
+             for rendition in renditions]
+        )
+
+    def add_episode(self, filename: str, title: str, description: str, pub_date: str, duration: str = None,
+                    audio_info=None, timeline: str = None, renditions=None) -> bool:
+        """Add a new episode to the database.
+
+        audio_info is an optional AudioInfo with the file's exact duration, size, bitrate and hash,
+        timeline an optional JSON list of the pipeline stages that produced it, and renditions
+        an optional list of Renditions of the file in other encodings.
+        """
+        duration_seconds, size_bytes, bitrate, sha256 = audio_info or (None, None, None, None)
+        try:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    '''INSERT INTO episodes (filename, title, description, pub_date, duration)
-                       VALUES (?, ?, ?, ?, ?)''',
-                    (filename, title, description, pub_date, duration)
+                    '''INSERT INTO episodes (filename, title, description, pub_date, duration,
+                                             duration_seconds, size_bytes, bitrate, sha256,
+                                             description_html, published_at, timeline)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (filename, title, description, pub_date, duration,
+                     duration_seconds, size_bytes, bitrate, sha256,
+                     description_to_html(description), pub_date_timestamp(pub_date), timeline)
                 )
+                if renditions:
+                    self._insert_renditions(cursor, cursor.lastrowid, renditions)
                 conn.commit()
                 logger.info(f"Added episode: {title}")
                 return True
@@ -63,10 +293,98 @@ class DatabaseService:
             logger.error(f"Error adding episode: {str(e)}")
             return False
 
+    def get_episodes_missing_audio_info(self):
+        """Return the filenames of episodes recorded before audio properties were stored."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT filename FROM episodes WHERE size_bytes IS NULL ORDER BY id')
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error retrieving episodes: {str(e)}")
+            return []
+
+    def update_episode_audio_info(self, filename: str, duration: str, audio_info) -> bool:
+        """Store the measured audio properties of an existing episode."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''UPDATE episodes
+                       SET duration = ?, duration_seconds = ?, size_bytes = ?, bitrate = ?, sha256 = ?
+                       WHERE filename = ?''',
+                    (duration, *audio_info, filename)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error updating episode {filename}: {str(e)}")
+            return False
+
+    def get_rendition_profiles(self):
+        """Return {filename: set of rendition profile names} for every episode."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''SELECT e.filename, r.profile
+                       FROM episodes e LEFT JOIN episode_renditions r ON r.episode_id = e.id
+                       ORDER BY e.id'''
+                )
+                profiles = {}
+                for filename, profile in cursor.fetchall():
+                    profiles.setdefault(filename, set())
+                    if profile:
+                        profiles[filename].add(profile)
+                return profiles
+        except Exception as e:
+            logger.error(f"Error retrieving renditions: {str(e)}")
+            return {}
+
+    def add_renditions(self, filename: str, renditions) -> bool:
+        """Record renditions of an existing episode, replacing any with the same profile."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id FROM episodes WHERE filename = ?', (filename,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                self._insert_renditions(cursor, row[0], renditions)
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error adding renditions of {filename}: {str(e)}")
+            return False
+
+    def delete_episode(self, filename: str):
+        """Delete an episode and its renditions from the database by its audio filename.
+
+        Returns the audio filenames the episode owned (its own first, then its renditions'),
+        or None if there is no such episode or the delete failed.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id FROM episodes WHERE filename = ?', (filename,))
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                cursor.execute('SELECT filename FROM episode_renditions WHERE episode_id = ?', (row[0],))
+                filenames = [filename] + [rendition[0] for rendition in cursor.fetchall()]
+                cursor.execute('DELETE FROM episode_renditions WHERE episode_id = ?', (row[0],))
+                cursor.execute('DELETE FROM episodes WHERE id = ?', (row[0],))
+                conn.commit()
+                logger.info(f"Deleted episode: {filename}")
+                return filenames
+        except Exception as e:
+            logger.error(f"Error deleting episode: {str(e)}")
+            return None
+
     def get_all_episodes(self):
         """Retrieve all episodes for the feed."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     '''SELECT filename, title, description, pub_date, duration
@@ -78,5 +396,188 @@ class DatabaseService:
             logger.error(f"Error retrieving episodes: {str(e)}")
             return []
 
+    def get_episodes_page(self, limit: int, before=None):
+        """Retrieve a page of episodes, newest first.
+
+        Args:
+            limit: Maximum number of episodes to return
+            before: Optional (created_at, id) cursor; only older episodes are returned
+
+        Returns:
+            Tuple of (episodes, next_cursor), where episodes are dicts with a
+            list of their renditions and next_cursor is None on the last page
+
+        Database errors are raised rather than returned as an empty page, which
+        the feed and home page caches would keep serving.
+        """
+        columns = '''filename, title, description, description_html, pub_date, published_at,
+                     duration, size_bytes, bitrate, created_at, id'''
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            if before:
+                cursor.execute(
+                    f'''SELECT {columns}
+                       FROM episodes
+                       WHERE (created_at, id) < (?, ?)
+                       ORDER BY created_at DESC, id DESC
+                       LIMIT ?''',
+                    (*before, limit + 1)
+                )
+            else:
+                cursor.execute(
+                    f'''SELECT {columns}
+                       FROM episodes
+                       ORDER BY created_at DESC, id DESC
+                       LIMIT ?''',
+                    (limit + 1,)
+                )
+            rows = cursor.fetchall()
+
+            # The extra row only tells us whether another page exists
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+            episodes = [dict(row, renditions=[]) for row in rows]
+            if episodes:
+                by_id = {episode['id']: episode for episode in episodes}
+                cursor.execute(
+                    f'''SELECT episode_id, profile, filename, mimetype, size_bytes, bitrate
+                       FROM episode_renditions
+                       WHERE episode_id IN ({', '.join('?' * len(by_id))})
+                       ORDER BY id''',
+                    tuple(by_id)
+                )
+                for rendition in cursor.fetchall():
+                    by_id[rendition['episode_id']]['renditions'].append(dict(rendition))
+
+        return episodes, next_cursor
+
+    def add_job(self, stage: str, content: str = None, original_url: str = None):
+        """Queue a new processing job and return its id."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''INSERT INTO jobs (stage, content, original_url)
+                       VALUES (?, ?, ?)''',
+                    (stage, content, original_url)
+                )
+                conn.commit()
+                return cursor.lastrowid
+        except Exception as e:
+            logger.error(f"Error adding job: {str(e)}")
+            return None
+
+    def get_job(self, job_id: int):
+        """Retrieve a job as a dict, or None if it doesn't exist."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Error retrieving job {job_id}: {str(e)}")
+            return None
+
+    def find_active_job(self, original_url: str):
+        """Return the id of a queued or running job for a URL, or None."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''SELECT id FROM jobs
+                       WHERE original_url = ? AND status IN ('queued', 'running')
+                       ORDER BY id LIMIT 1''',
+                    (original_url,)
+                )
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error looking up job for {original_url}: {str(e)}")
+            return None
+
+    def claim_next_job(self):
+        """Mark the oldest queued job as running and return it, or None if the queue is empty."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                while True:
+                    cursor.execute(
+                        '''SELECT id FROM jobs WHERE status = 'queued'
+                           ORDER BY id LIMIT 1'''
+                    )
+                    row = cursor.fetchone()
+                    if row is None:
+                        return None
+
+                    # Only one worker can win the queued -> running transition
+                    cursor.execute(
+                        '''UPDATE jobs
+                           SET status = 'running', attempts = attempts + 1,
+                               updated_at = CURRENT_TIMESTAMP
+                           WHERE id = ? AND status = 'queued' ''',
+                        (row['id'],)
+                    )
+                    conn.commit()
+                    if cursor.rowcount == 1:
+                        cursor.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],))
+                        return dict(cursor.fetchone())
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            return None
+
+    def update_job(self, job_id: int, **fields) -> bool:
+        """Update job columns (e.g. stage, status, intermediate results)."""
+        unknown = set(fields) - self.JOB_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown job columns: {', '.join(sorted(unknown))}")
+
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'''UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?''',
+                    (*fields.values(), job_id)
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error updating job {job_id}: {str(e)}")
+            return False
+
+    def count_jobs(self, status: str) -> int:
+        """Return the number of jobs with a status."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (status,))
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error counting jobs: {str(e)}")
+            return 0
+
+    def requeue_running_jobs(self) -> int:
+        """Return jobs left running by a previous process to the queue."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    '''UPDATE jobs SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+                       WHERE status = 'running' '''
+                )
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error requeuing jobs: {str(e)}")
+            return 0
+
 # Create a singleton instance
 db = DatabaseService()
@@ -1,25 +1,64 @@
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from mutagen.mp3 import MP3
+import hashlib
+import threading
+from collections import namedtuple
 import os
 from pathlib import Path
 import logging
+from urllib.parse import urlencode
 from config.config import (
     FEED_TITLE,
     FEED_DESCRIPTION,
     BASE_URL,
     FEED_LANGUAGE,
     FEED_IMAGE,
+    FEED_PAGE_SIZE,
     AUDIO_PATH,
 )
-from .database_service import db
+from .database_service import db, decode_cursor
+from .audio_service import RENDITION_PROFILES
 
 logger = logging.getLogger(__name__)
 
-def generate_feed():
-    """Generate RSS feed XML."""
+# Rendered feed plus the validators clients use for conditional requests
+RenderedFeed = namedtuple('RenderedFeed', 'xml etag last_modified')
+
+# Rendered pages keyed by (rendition, cursor), None being the MP3 feed and the newest
+# page, valid for one database version
+_cache = {'version': None, 'pages': {}}
+_cache_lock = threading.Lock()
+MAX_CACHED_PAGES = 32
+
+def feed_url(rendition=None, cursor=None):
+    """Return the URL of a feed page, for the MP3 feed or a rendition's alternate feed."""
+    params = {key: value for key, value in (('rendition', rendition), ('cursor', cursor)) if value}
+    return f"{BASE_URL}/feed?{urlencode(params)}" if params else f"{BASE_URL}/feed"
+
+def add_alternate_enclosure(item, url, mimetype, length, bitrate, title, default=False):
+    """Add a podcast:alternateEnclosure listing one encoding of an episode."""
+    attrib = {"type": mimetype, "length": str(length or 0), "title": title}
+    if bitrate:
+        attrib["bitrate"] = str(bitrate)
+    if default:
+        attrib["default"] = "true"
+    alternate = ET.SubElement(item, "podcast:alternateEnclosure", attrib)
+    ET.SubElement(alternate, "podcast:source", uri=url)
+
+def render_feed(cursor=None, rendition=None):
+    """Build the RSS feed XML for one page of episodes from the database.
+
+    The newest page holds the latest FEED_PAGE_SIZE episodes; older episodes
+    are reachable through archive pages linked with atom:link rel="next".
+    The MP3 feed lists every episode's renditions as podcast:alternateEnclosure
+    elements; a rendition's alternate feed uses them as the enclosures instead,
+    falling back to the MP3 for episodes published before it was configured.
+    """
+    before = decode_cursor(cursor) if cursor else None
+
     rss = ET.Element("rss", version="2.0",
-                    attrib={"xmlns:itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd"})
+                    attrib={"xmlns:itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd",
+                            "xmlns:atom": "http://www.w3.org/2005/Atom",
+                            "xmlns:podcast": "https://podcastindex.org/namespace/1.0"})
     channel = ET.SubElement(rss, "channel")
 
     # Add channel information
@@ -29,30 +68,85 @@ def generate_feed():
     ET.SubElement(channel, "language").text = FEED_LANGUAGE
     ET.SubElement(channel, "itunes:image", href=f"{BASE_URL}/static/images/{FEED_IMAGE}")
 
-    # Get episodes from database
-    episodes = db.get_all_episodes()
+    # Get one page of episodes from database
+    episodes, next_cursor = db.get_episodes_page(FEED_PAGE_SIZE, before)
+
+    # Paging links (RFC 5005)
+    ET.SubElement(channel, "atom:link", href=feed_url(rendition, cursor), rel="self", type="application/rss+xml")
+    if cursor:
+        ET.SubElement(channel, "atom:link", href=feed_url(rendition), rel="first", type="application/rss+xml")
+    if next_cursor:
+        ET.SubElement(channel, "atom:link", href=feed_url(rendition, next_cursor),
+                      rel="next", type="application/rss+xml")
+
+    # Alternate feeds for players that don't read podcast:alternateEnclosure
+    if rendition is None:
+        for profile in RENDITION_PROFILES:
+            ET.SubElement(channel, "atom:link", href=feed_url(profile.name), rel="alternate",
+                          type="application/rss+xml", title=profile.name)
 
     # Add episodes to feed
-    for filename, title, description, pub_date, duration in episodes:
+    for episode in episodes:
         item = ET.SubElement(channel, "item")
-        ET.SubElement(item, "title").text = title
-        ET.SubElement(item, "description").text = description
+        ET.SubElement(item, "title").text = episode['title']
+        ET.SubElement(item, "description").text = episode['description']
 
         # Create the full URL for the audio file
-        audio_url = f"{BASE_URL}/static/audio/{filename}"
-        ET.SubElement(item, "enclosure",
-                     url=audio_url,
-                     type="audio/mpeg")
+        audio_url = f"{BASE_URL}/static/audio/{episode['filename']}"
+        enclosure = next((r for r in episode['renditions'] if r['profile'] == rendition), None)
+        if enclosure:
+            ET.SubElement(item, "enclosure",
+                         url=f"{BASE_URL}/static/audio/{enclosure['filename']}",
+                         length=str(enclosure['size_bytes'] or 0),
+                         type=enclosure['mimetype'])
+        else:
+            ET.SubElement(item, "enclosure",
+                         url=audio_url,
+                         length=str(episode['size_bytes'] or 0),
+                         type="audio/mpeg")
+
+        if rendition is None and episode['renditions']:
+            add_alternate_enclosure(item, audio_url, "audio/mpeg", episode['size_bytes'],
+                                    episode['bitrate'], "mp3", default=True)
+            for alternate in episode['renditions']:
+                add_alternate_enclosure(item, f"{BASE_URL}/static/audio/{alternate['filename']}",
+                                        alternate['mimetype'], alternate['size_bytes'],
+                                        alternate['bitrate'], alternate['profile'])
 
-        ET.SubElement(item, "pubDate").text = pub_date
+        ET.SubElement(item, "pubDate").text = episode['pub_date']
 
         # Add duration if available
-        if duration:
-            ET.SubElement(item, "itunes:duration").text = duration
-        else:
-            ET.SubElement(item, "itunes:duration").text = "00:00:00"
+        ET.SubElement(item, "itunes:duration").text = episode['duration'] or "00:00:00"
+
+    # Pretty print in place and serialize once
+    ET.indent(rss, space="  ")
+    return ET.tostring(rss, encoding='utf-8', xml_declaration=True)
+
+def get_feed(cursor=None, rendition=None):
+    """Return a rendered feed page, rebuilding it only when episodes have changed.
 
-    # Convert to pretty XML
-    rough_string = ET.tostring(rss, 'utf-8', method='xml')
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
+    rendition names an AUDIO_RENDITIONS profile for its alternate feed, or is
+    None for the MP3 feed. Raises ValueError if the cursor or rendition is invalid.
+    """
+    if rendition is not None and rendition not in {profile.name for profile in RENDITION_PROFILES}:
+        raise ValueError(f'Unknown rendition: {rendition}')
+
+    with _cache_lock:
+        # Read the version before rendering so a concurrent change triggers another rebuild
+        version = db.version
+        if _cache['version'] != version or len(_cache['pages']) >= MAX_CACHED_PAGES:
+            _cache['pages'] = {}
+            _cache['version'] = version
+
+        rendered = _cache['pages'].get((rendition, cursor))
+        if rendered is None:
+            xml = render_feed(cursor, rendition)
+            etag = hashlib.sha256(xml).hexdigest()[:32]
+            rendered = RenderedFeed(xml, etag, db.changed_at)
+            _cache['pages'][(rendition, cursor)] = rendered
+            logger.info(f'Rendered feed page ({len(xml)} bytes)')
+        return rendered
+
+def generate_feed():
+    """Generate RSS feed XML."""
+    return get_feed().xml.decode('utf-8')
@@ -0,0 +1,173 @@
+import math
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from .database_service import db
+
+logger = logging.getLogger(__name__)
+
+# Every metric created, in the order they are exposed
+REGISTRY = []
+
+# Default histogram buckets in seconds, from fast requests to long TTS runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def format_value(value):
+    """Format a sample value for the Prometheus text format."""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def format_labels(names, values, extra=()):
+    """Format a label set as {name="value",...}, or '' if there are no labels."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+class Metric:
+    """A named metric with optional labels, registered for exposition."""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for each sample."""
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield '', key, (), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}')
+        return lines
+
+class Counter(Metric):
+    """A value that only goes up, such as tokens used."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, optionally read from a function at scrape time."""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self.function is None:
+            yield from super().samples()
+            return
+        try:
+            yield '', (), (), self.function()
+        except Exception as e:
+            logger.error(f'Error reading gauge {self.name}: {str(e)}')
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, such as latencies."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the enclosed block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', key, (('le', format_value(bound)),), cumulative
+            yield '_sum', key, (), total
+            yield '_count', key, (), cumulative
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram('hypercast_stage_seconds', 'Time spent in each episode pipeline stage', ['stage'])
+API_SECONDS = Histogram('hypercast_api_request_seconds', 'Latency of OpenAI API requests and local speech synthesis', ['api'])
+LLM_TOKENS = Counter('hypercast_llm_tokens_total', 'GPT tokens used', ['stage', 'kind'])
+TTS_CHARACTERS = Counter('hypercast_tts_characters_total', 'Characters of text synthesized to speech', ['source'])
+AUDIO_BYTES = Counter('hypercast_audio_bytes_total', 'Bytes of audio written', ['kind'])
+JOBS_IN_FLIGHT = Gauge('hypercast_jobs_in_flight', 'Jobs currently being processed by workers')
+JOBS_QUEUED = Gauge('hypercast_jobs_queued', 'Jobs waiting for a worker', function=lambda: db.count_jobs('queued'))
+JOBS_FINISHED = Counter('hypercast_jobs_finished_total', 'Job attempts finished, by outcome', ['outcome'])
+
+# HTTP metrics
+REQUEST_SECONDS = Histogram('hypercast_request_seconds', 'HTTP request latency', ['route', 'status'])
@@ -0,0 +1,126 @@
+import os
+import subprocess
+import logging
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+from config.config import (
+    TTS_BACKEND,
+    TTS_MODEL,
+    TTS_VOICE,
+    TTS_SPEED,
+    TTS_CONCURRENCY,
+    TTS_LOCAL_BINARY,
+    TTS_LOCAL_VOICE,
+    TTS_LOCAL_PROCESSES,
+    AUDIO_OUTPUT_FORMAT
+)
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from .audio_service import Mp3Format, encode_mp3
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Format local engine output is encoded to; speech needs little more than this
+LOCAL_MP3_FORMAT = Mp3Format(2, 22050, 1, 64000)
+
+class OpenAIBackend:
+    """Synthesize speech with the OpenAI TTS API."""
+
+    name = 'openai'
+
+    def __init__(self):
+        # Retries are handled per segment (TTS_MAX_RETRIES), so the client mustn't retry as well
+        self.client = OpenAI(max_retries=0)
+        # Errors worth retrying; anything else (bad request, auth) fails the segment immediately
+        self.retryable_errors = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+        # Concurrent API calls across all episodes
+        self.concurrency = TTS_CONCURRENCY
+        # Settings that affect the audio, for segment cache keys
+        self.cache_identity = (TTS_MODEL, TTS_VOICE, TTS_SPEED)
+
+    def synthesize(self, text, output_path):
+        """Write speech for text to output_path."""
+        response = self.client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            response_format=AUDIO_OUTPUT_FORMAT,
+            speed=TTS_SPEED
+        )
+        response.stream_to_file(str(output_path))
+
+class LocalBackend(ABC):
+    """Synthesize speech with a local engine, one process per segment.
+
+    The engine writes a WAV file that ffmpeg encodes to the output format.
+    Segments run concurrently up to TTS_LOCAL_PROCESSES, one per core by default.
+    """
+
+    name = None
+    default_binary = None
+    default_voice = None
+
+    def __init__(self):
+        self.binary = TTS_LOCAL_BINARY or self.default_binary
+        self.voice = TTS_LOCAL_VOICE or self.default_voice
+        self.retryable_errors = ()
+        self.concurrency = TTS_LOCAL_PROCESSES
+        self.cache_identity = (self.name, self.voice, TTS_SPEED)
+
+    @abstractmethod
+    def command(self, wav_path):
+        """Return the engine command that reads text on stdin and writes wav_path."""
+
+    def synthesize(self, text, output_path):
+        """Write speech for text to output_path."""
+        wav_path = output_path.with_suffix('.wav')
+        try:
+            result = subprocess.run(self.command(wav_path), input=text, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f'{self.name} failed: {result.stderr.strip()}')
+            if AUDIO_OUTPUT_FORMAT == 'mp3':
+                encode_mp3(wav_path, output_path, LOCAL_MP3_FORMAT)
+            else:
+                os.replace(wav_path, output_path)
+        finally:
+            if wav_path.exists():
+                wav_path.unlink()
+
+class PiperBackend(LocalBackend):
+    """Piper neural TTS; TTS_LOCAL_VOICE is the path to a voice model (.onnx)."""
+
+    name = 'piper'
+    default_binary = 'piper'
+
+    def __init__(self):
+        super().__init__()
+        if not self.voice:
+            raise ValueError('TTS_LOCAL_VOICE must be set to a Piper voice model for TTS_BACKEND=piper')
+
+    def command(self, wav_path):
+        return [self.binary, '--model', self.voice, '--length_scale', str(1 / TTS_SPEED),
+                '--output_file', str(wav_path)]
+
+class EspeakBackend(LocalBackend):
+    """eSpeak NG formant synthesis; TTS_LOCAL_VOICE is a voice name such as en-us."""
+
+    name = 'espeak'
+    default_binary = 'espeak-ng'
+    default_voice = 'en-us'
+
+    def command(self, wav_path):
+        return [self.binary, '-v', self.voice, '-s', str(round(175 * TTS_SPEED)),
+                '-w', str(wav_path), '--stdin']
+
+BACKENDS = {backend.name: backend for backend in (OpenAIBackend, PiperBackend, EspeakBackend)}
+
+def get_backend(name=TTS_BACKEND):
+    """Create the TTS backend selected by name."""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+    logger.info(f'Using {name} TTS backend')
+    return backend()
@@ -1,45 +1,164 @@
-from pydub import AudioSegment
 from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 from datetime import datetime
 import uuid
 import os
+import random
+import re
+import time
 import logging
 from dotenv import load_dotenv
 from config.config import (
-    TTS_MODEL,
-    TTS_VOICE,
-    TTS_SPEED,
+    TTS_MAX_RETRIES,
+    TTS_RETRY_BACKOFF,
     AUDIO_OUTPUT_FORMAT,
     AUDIO_OUTPUT_QUALITY,
     AUDIO_PATH,
-    INTRO_SOUND_PATH
+    INTRO_SOUND_PATH,
+    OUTRO_SOUND_PATH
 )
-from mutagen.mp3 import MP3
 from .content_service import save_episode_to_db
+from .audio_service import (
+    RENDITION_CODECS,
+    RENDITION_PROFILES,
+    Mp3Writer,
+    Rendition,
+    conform_asset,
+    encode_renditions,
+    parse_bitrate,
+    read_audio_info,
+    stream_format
+)
+from .cache_service import segment_cache, make_key
+from .metrics_service import API_SECONDS, TTS_CHARACTERS, AUDIO_BYTES
+from .tts_backends import get_backend
 
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-from openai import OpenAI
-client = OpenAI()
+# Speech engine selected by TTS_BACKEND
+tts_backend = get_backend()
+
+# Shared pool so concurrent episodes together stay within the backend's concurrency
+# (TTS_CONCURRENCY API calls, or TTS_LOCAL_PROCESSES engine processes)
+tts_executor = ThreadPoolExecutor(max_workers=max(1, tts_backend.concurrency), thread_name_prefix='tts')
+
+# Places a segment may end, strongest first: paragraph breaks, sentence ends, line breaks
+BREAK_PATTERN = re.compile(r'\n[ \t]*\n\s*|(?<=[.!?])[\'"\u201d\u2019)\]]*\s+|\n\s*')
+BREAK_PARAGRAPH, BREAK_SENTENCE, BREAK_LINE, BREAK_WORD = 0, 1, 2, 3
+
+# Cost of ending a segment at each kind of break, relative to length imbalance
+BREAK_PENALTIES = {BREAK_PARAGRAPH: 0.0, BREAK_SENTENCE: 0.05, BREAK_LINE: 0.1, BREAK_WORD: 1.0}
+
+# Words, for breaking sentences longer than a segment
+WORD_PATTERN = re.compile(r'\S+')
+
+# Units smaller than 1/MIN_UNIT_FRACTION of a segment are merged, so planning stays linear in the text
+MIN_UNIT_FRACTION = 64
+
+SegmentPlan = namedtuple('SegmentPlan', 'index start end text')
+
+# A combined episode file and its AudioInfo
+CombinedAudio = namedtuple('CombinedAudio', 'path info')
+
+def tokenize_units(text, length):
+    """Find the units segments are built from, as (start, end, break after) tuples.
+
+    Units are sentences, or words of sentences longer than length, so the
+    planner can balance unpunctuated text too. Units shorter than
+    length / MIN_UNIT_FRACTION are joined with the next one (never across a
+    paragraph break), which bounds how many units fit in one segment.
+    """
+    pieces = []
+    position = 0
+    matches = [(m.start(), m.end(), m.group()) for m in BREAK_PATTERN.finditer(text)]
+    matches.append((len(text), len(text), '\n\n'))
+    for match_start, match_end, separator in matches:
+        start = position
+        end = match_start
+        position = match_end
+        # Trailing closing quotes/brackets belong to the sentence
+        stripped = separator.lstrip('\'"\u201d\u2019)]')
+        end += len(separator) - len(stripped)
+        if '\n' in separator:
+            kind = BREAK_PARAGRAPH if separator.count('\n') > 1 else BREAK_LINE
+        else:
+            kind = BREAK_SENTENCE
+
+        if end - start <= length:
+            if end > start:
+                pieces.append((start, end, kind))
+            continue
+
+        # Overlong sentence: break between words, and inside words longer than length
+        for word in WORD_PATTERN.finditer(text, start, end):
+            for piece_start in range(word.start(), word.end(), length):
+                pieces.append((piece_start, min(piece_start + length, word.end()), BREAK_WORD))
+        pieces[-1] = (pieces[-1][0], pieces[-1][1], kind)
+
+    min_size = max(1, length // MIN_UNIT_FRACTION)
+    units = []
+    for start, end, kind in pieces:
+        if units:
+            unit_start, unit_end, unit_kind = units[-1]
+            if unit_end - unit_start < min_size and unit_kind != BREAK_PARAGRAPH and end - unit_start <= length:
+                units[-1] = (unit_start, end, kind)
+                continue
+        units.append((start, end, kind))
+    return units
+
+def plan_segments(text, length=4096):
+    """Plan how to split text into segments of at most length characters.
+
+    Segments end at paragraph or sentence boundaries where possible and are
+    balanced in length, using the fewest segments the boundaries allow. The
+    text is tokenized once and each segment is sliced once.
+
+    Returns:
+        List of SegmentPlan(index, start, end, text)
+    """
+    units = tokenize_units(text, length)
+    if not units:
+        return []
+
+    total = units[-1][1] - units[0][0]
+    target = total / max(1, -(-total // length))
+
+    # best[i] = (segment count, cost, previous break) for the first i units
+    best = [(0, 0.0, None)] + [None] * len(units)
+    for i in range(1, len(units) + 1):
+        end = units[i - 1][1]
+        is_last = i == len(units)
+        penalty = 0.0 if is_last else BREAK_PENALTIES[units[i - 1][2]]
+        for j in range(i - 1, -1, -1):
+            span = end - units[j][0]
+            if span > length:
+                break
+            if best[j] is None:
+                continue
+            count = best[j][0] + 1
+            cost = best[j][1] + ((span - target) / length) ** 2 + penalty
+            if best[i] is None or (count, cost) < best[i][:2]:
+                best[i] = (count, cost, j)
+
+    # Walk the chosen breaks back from the end
+    bounds = []
+    i = len(units)
+    while i:
+        j = best[i][2]
+        bounds.append((units[j][0], units[i - 1][1]))
+        i = j
+    bounds.reverse()
+
+    return [SegmentPlan(index, start, end, text[start:end]) for index, (start, end) in enumerate(bounds)]
 
 def split_text(text, length=4096):
     """Split the text into segments, ensuring no segment splits a word in half."""
-    segments = []
-    while text:
-        if len(text) <= length:
-            segments.append(text)
-            break
-        split_index = text.rfind(' ', 0, length)
-        if split_index == -1:  # In case there are no spaces, force a split
-            split_index = length
-        segments.append(text[:split_index])
-        text = text[split_index+1:]  # Skip the space when starting the next segment
-    return segments
+    return [segment.text for segment in plan_segments(text, length)]
 
 def create_filename(base_filename, extension, is_final=False):
     """Generate a filename with datetime and a short random key."""
@@ -71,115 +190,280 @@ def cleanup_temp_files(temp_files):
         except Exception as e:
             logger.error(f'Error cleaning up temp file {file_path}: {str(e)}')
 
+def retry_delay(error, attempt):
+    """Calculate the backoff delay for a retry, honoring Retry-After if present."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            pass
+    return TTS_RETRY_BACKOFF * (2 ** attempt) + random.uniform(0, 1)
+
+def segment_cache_key(text_segment):
+    """Cache key covering everything that affects a segment's audio."""
+    return make_key('tts', text_segment, *tts_backend.cache_identity, AUDIO_OUTPUT_FORMAT)
+
+def copy_cached_segment(cached_path, segment_path):
+    """Place a cached segment in tmp/, hard-linking when possible."""
+    try:
+        os.link(cached_path, segment_path)
+    except OSError:
+        shutil.copyfile(cached_path, segment_path)
+    return segment_path
+
 def text_to_speech_segment(text_segment, segment_index, base_filename, tmp_dir):
-    """Convert a text segment to speech using OpenAI TTS."""
+    """Convert a text segment to speech with the configured TTS backend."""
     segment_path = create_filename(base_filename, AUDIO_OUTPUT_FORMAT, is_final=False)
 
-    try:
-        response = client.audio.speech.create(
-            model=TTS_MODEL,
-            voice=TTS_VOICE,
-            input=text_segment,
-            response_format=AUDIO_OUTPUT_FORMAT,
-            speed=TTS_SPEED
-        )
-        response.stream_to_file(str(segment_path))
-
-        # Verify the file was created
-        if not segment_path.exists():
-            logger.error(f'Failed to create segment file: {segment_path}')
-            return None
+    cache_key = segment_cache_key(text_segment)
+    cached_path = segment_cache.get_path(cache_key)
+    if cached_path:
+        try:
+            logger.info(f'Using cached audio for segment {segment_index + 1}')
+            segment_path = copy_cached_segment(cached_path, segment_path)
+            TTS_CHARACTERS.inc(len(text_segment), source='cache')
+            return segment_path
+        except OSError as e:
+            logger.warning(f'Could not use cached segment {segment_index + 1}: {str(e)}')
 
-        return segment_path
-    except Exception as e:
-        logger.error(f'Error creating speech segment: {str(e)}')
-        if segment_path.exists():
-            segment_path.unlink()
-        return None
+    for attempt in range(TTS_MAX_RETRIES + 1):
+        try:
+            with API_SECONDS.time(api=f'speech_{tts_backend.name}'):
+                tts_backend.synthesize(text_segment, segment_path)
+
+            # Verify the file was created
+            if not segment_path.exists():
+                logger.error(f'Failed to create segment file: {segment_path}')
+                return None
+
+            TTS_CHARACTERS.inc(len(text_segment), source='api')
+            AUDIO_BYTES.inc(segment_path.stat().st_size, kind='segment')
+
+            segment_cache.put_file(cache_key, segment_path)
+            return segment_path
+        except tts_backend.retryable_errors as e:
+            if segment_path.exists():
+                segment_path.unlink()
+            if attempt >= TTS_MAX_RETRIES:
+                logger.error(f'Giving up on segment {segment_index + 1} after {attempt + 1} attempts: {str(e)}')
+                return None
+            delay = retry_delay(e, attempt)
+            logger.warning(f'Retrying segment {segment_index + 1} in {delay:.1f}s: {str(e)}')
+            time.sleep(delay)
+        except Exception as e:
+            logger.error(f'Error creating speech segment: {str(e)}')
+            if segment_path.exists():
+                segment_path.unlink()
+            return None
 
-def combine_audio_segments(segment_data, base_filename):
-    """Combine multiple audio segments into a single file, prepending a sound effect.
+class EpisodeAssembler:
+    """Build an episode file while its segments are still being synthesized.
 
-    Args:
-        segment_data: List of tuples containing (index, path) for each segment
-        base_filename: Base name for the final output file
+    Segments are queued for synthesis as they're submitted, and each one is
+    appended to the episode file as soon as it and every earlier segment are
+    done, then its temp file is deleted. Duration, size and hash are
+    accumulated along the way.
     """
-    final_output_path = create_filename(base_filename, AUDIO_OUTPUT_FORMAT, is_final=True)
-    successful_segments = []
 
-    try:
-        # Start with the sound effect
-        combined = AudioSegment.empty()
+    def __init__(self, base_filename, tmp_dir):
+        self.base_filename = base_filename
+        self.tmp_dir = tmp_dir
+        self.final_path = create_filename(base_filename, AUDIO_OUTPUT_FORMAT, is_final=True)
+        self.futures = []  # Segment futures in index order
+        self.appended = 0
+        self.writer = None
+
+    def submit(self, text_segment):
+        """Queue a segment for synthesis after the ones already submitted."""
+        index = len(self.futures)
+        self.futures.append(tts_executor.submit(
+            text_to_speech_segment, text_segment, index, self.base_filename, self.tmp_dir
+        ))
+
+    def append_ready(self, wait=False):
+        """Append finished segments in order, stopping at the first unfinished one unless wait is set.
 
-        # Add intro sound if available
-        if INTRO_SOUND_PATH.exists():
+        Raises RuntimeError if a segment failed.
+        """
+        while self.appended < len(self.futures):
+            future = self.futures[self.appended]
+            if not wait and not future.done():
+                return
+            segment_path = future.result()
+            if not segment_path:
+                raise RuntimeError(f'Failed to create segment {self.appended + 1}')
             try:
-                sound_effect = AudioSegment.from_file(str(INTRO_SOUND_PATH))
-                combined += sound_effect
-                logger.info(f'Successfully added intro sound ({sound_effect.duration_seconds:.2f}s)')
-            except Exception as e:
-                logger.error(f'Could not load intro sound: {str(e)}')
-        else:
-            logger.warning(f'Intro sound not found at {INTRO_SOUND_PATH}')
+                if self.writer is None:
+                    self._start(segment_path)
+                self.writer.append(segment_path)
+            finally:
+                cleanup_temp_files([segment_path])
+            self.appended += 1
+            logger.info(f'Appended segment {self.appended} of {len(self.futures)}')
 
-        # Sort segments by index to ensure correct order
-        sorted_segments = sorted(segment_data, key=lambda x: x[0])
+    def _start(self, first_segment):
+        """Open the episode file in the first segment's format and write the intro."""
+        mp3_format = stream_format(first_segment, parse_bitrate(AUDIO_OUTPUT_QUALITY))
+        if mp3_format is None:
+            raise ValueError(f'Segment {first_segment.name} is not MP3 audio')
+        self.writer = Mp3Writer(self.final_path, mp3_format)
+        intro_path = sound_asset_path(INTRO_SOUND_PATH, mp3_format, 'Intro')
+        if intro_path:
+            self.writer.append(intro_path)
 
-        # Validate segment sequence
-        expected_indices = set(range(len(sorted_segments)))
-        actual_indices = set(index for index, _ in sorted_segments)
-        if expected_indices != actual_indices:
-            missing_segments = expected_indices - actual_indices
-            logger.error(f'Missing segments: {missing_segments}')
-            return None
+    def finish(self):
+        """Wait for the remaining segments, add the outro and return the CombinedAudio."""
+        self.append_ready(wait=True)
+        if self.writer is None:
+            raise ValueError('No segments to combine')
+        if OUTRO_SOUND_PATH:
+            outro_path = sound_asset_path(OUTRO_SOUND_PATH, self.writer.mp3_format, 'Outro')
+            if outro_path:
+                self.writer.append(outro_path)
 
-        # Add all the TTS segments in order
-        logger.info('Adding TTS segments to audio')
-        for index, segment_path in sorted_segments:
-            try:
-                if isinstance(segment_path, str):
-                    segment_path = Path(segment_path)
-                if not segment_path.exists():
-                    logger.error(f'Segment file not found: {segment_path}')
-                    continue
-
-                segment_audio = AudioSegment.from_file(str(segment_path), format=AUDIO_OUTPUT_FORMAT)
-                combined += segment_audio
-                successful_segments.append(segment_path)
-                logger.info(f'Added segment: {segment_path.name}')
-            except Exception as e:
-                logger.error(f'Error adding segment {segment_path}: {str(e)}')
-
-        # Only proceed if we have at least one successful segment
-        if not successful_segments:
-            logger.error('No segments were successfully processed')
-            return None
+        audio_info = self.writer.close()
+        AUDIO_BYTES.inc(audio_info.size, kind='episode')
+        logger.info(f'Successfully exported combined audio to: {self.final_path.name}')
+        return CombinedAudio(self.final_path, audio_info)
+
+    def abort(self):
+        """Stop queued segments and remove every file written so far."""
+        pending = self.futures[self.appended:]
+        for future in pending:
+            future.cancel()
+        # Segments already running can't be stopped; wait for them so their files are removed too
+        cleanup_temp_files([
+            future.result() for future in pending
+            if not future.cancelled() and future.result()
+        ])
+        if self.writer is not None:
+            self.writer.discard()
+
+def synthesize_episode(segments, base_filename, tmp_dir):
+    """Convert text segments to speech concurrently, assembling the episode file as they finish.
+
+    Returns:
+        CombinedAudio, or None if any segment failed
+    """
+    assembler = EpisodeAssembler(base_filename, tmp_dir)
+    for segment in segments:
+        assembler.submit(segment)
+    try:
+        return assembler.finish()
+    except Exception as e:
+        logger.error(f'Error synthesizing episode: {str(e)}')
+        assembler.abort()
+        return None
+
+def synthesize_episode_stream(text_chunks, base_filename, tmp_dir):
+    """Convert text to speech as it arrives, e.g. while later chunks are still being cleaned.
+
+    Each chunk is split into segments that are queued for synthesis immediately,
+    numbered continuously across chunks, and appended to the episode file as
+    they finish. If a segment fails, the rest of the text is still read so the
+    caller has all of it to retry with. Errors from the text source are raised
+    after cleaning up.
+
+    Returns:
+        CombinedAudio, or None if any segment failed
+    """
+    assembler = EpisodeAssembler(base_filename, tmp_dir)
+    failed = False
+    chunks = iter(text_chunks)
+    while True:
+        try:
+            chunk = next(chunks, None)
+        except Exception:
+            # The text source failed; don't leave finished segments behind
+            if not failed:
+                assembler.abort()
+            raise
+        if chunk is None:
+            break
+        if failed:
+            continue
 
-        # Export the final audio file
-        combined.export(str(final_output_path), format=AUDIO_OUTPUT_FORMAT, bitrate=AUDIO_OUTPUT_QUALITY)
-        logger.info(f'Successfully exported combined audio to: {final_output_path.name}')
-        return final_output_path
+        try:
+            for segment in split_text(chunk):
+                assembler.submit(segment)
+            assembler.append_ready()
+        except Exception as e:
+            logger.error(f'Error synthesizing episode: {str(e)}')
+            assembler.abort()
+            failed = True
 
+    if failed:
+        return None
+    try:
+        return assembler.finish()
     except Exception as e:
-        logger.error(f'Error combining audio segments: {str(e)}')
-        if final_output_path.exists():
-            final_output_path.unlink()
+        logger.error(f'Error synthesizing episode: {str(e)}')
+        assembler.abort()
+        return None
+
+def sound_asset_path(path, mp3_format, label):
+    """Return an intro/outro sound matched to mp3_format, or None if it's missing."""
+    if not path.exists():
+        logger.warning(f'{label} sound not found at {path}')
         return None
-    finally:
-        # Clean up temp files after export attempt
-        cleanup_temp_files(successful_segments)
+    if mp3_format is None:
+        return path
+    return conform_asset(path, mp3_format)
+
+def format_duration(seconds):
+    """Format a duration in seconds as HH:MM:SS."""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def create_renditions(final_path, profiles=RENDITION_PROFILES):
+    """Encode a finished episode to each rendition profile in one ffmpeg pass.
 
-def get_audio_duration(filepath):
-    """Calculate episode duration from MP3 file."""
+    Renditions are optional extras, so a failure is logged and leaves the
+    episode with its MP3 only. Returns the list of Renditions written.
+    """
+    if not profiles:
+        return []
+
+    outputs = []
+    for profile in profiles:
+        extension = RENDITION_CODECS[profile.codec].extension
+        outputs.append((profile, final_path.with_name(f'{final_path.stem}-{profile.name}{extension}')))
     try:
-        audio = MP3(filepath)
-        duration = int(audio.info.length)
-        hours, remainder = divmod(duration, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
+        infos = encode_renditions(final_path, outputs)
     except Exception as e:
-        logger.error(f'Error calculating duration for {filepath}: {str(e)}')
-        return "00:00:00"
+        logger.warning(f'Could not encode renditions of {final_path.name}: {str(e)}')
+        for _, path in outputs:
+            path.unlink(missing_ok=True)
+        return []
+
+    renditions = [Rendition(profile, path, RENDITION_CODECS[profile.codec].mimetype, info)
+                  for (profile, path), info in zip(outputs, infos)]
+    for rendition in renditions:
+        AUDIO_BYTES.inc(rendition.info.size, kind='rendition')
+    logger.info(f'Encoded {final_path.name} as {", ".join(profile.name for profile in profiles)}')
+    return renditions
+
+def publish_episode(final_path, title, description, audio_info=None, timeline=None):
+    """Save a finished episode to the database with its duration, size, hash and renditions.
+
+    audio_info is measured from the file if it wasn't recorded when the file was written.
+    timeline is an optional JSON list of the pipeline stages that produced the episode.
+    """
+    if audio_info is None:
+        audio_info = read_audio_info(final_path)
+    duration = format_duration(audio_info.duration)
+    renditions = create_renditions(final_path)
+    if save_episode_to_db(final_path.name, title, description, duration=duration,
+                          audio_info=audio_info, timeline=timeline, renditions=renditions):
+        logger.info(f'Episode saved to database: {title}')
+        return final_path
+
+    logger.error('Failed to save episode to database')
+    for rendition in renditions:
+        rendition.path.unlink(missing_ok=True)
+    return None
 
 def create_episode(text, title, description, base_filename='episode'):
     """Create a complete episode from text."""
@@ -190,32 +474,11 @@ def create_episode(text, title, description, base_filename='episode'):
         # Split text into segments if needed
         segments = split_text(text)
 
-        # Convert each segment to speech
-        segment_data = []  # List of (index, path) tuples to maintain order
-        for index, segment in enumerate(segments):
-            logger.info(f'Processing segment {index + 1} of {len(segments)}')
-            segment_file = text_to_speech_segment(segment, index, base_filename, tmp_dir)
-            if segment_file:
-                segment_data.append((index, segment_file))
-            else:
-                logger.error(f'Failed to create segment {index + 1}')
-                # Clean up any segments we did create
-                cleanup_temp_files([path for _, path in segment_data])
-                return None
-
-        # Combine all segments into final audio file
-        if segment_data:
-            final_path = combine_audio_segments(segment_data, base_filename)
-
-            # Calculate duration and save episode to database
-            if final_path:
-                duration = get_audio_duration(final_path)
-                if save_episode_to_db(final_path.name, title, description, duration=duration):
-                    logger.info(f'Episode saved to database: {title}')
-                    return final_path
-            else:
-                logger.error('Failed to save episode to database')
-                return None
+        # Convert segments to speech in parallel, appending each to the episode as it's ready
+        logger.info(f'Synthesizing {len(segments)} segments')
+        combined = synthesize_episode(segments, base_filename, tmp_dir)
+        if combined:
+            return publish_episode(combined.path, title, description, combined.info)
 
         return None
     except Exception as e:
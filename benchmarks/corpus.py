@@ -0,0 +1,72 @@
+"""Deterministic synthetic articles for benchmarking, as plain text and HTML pages."""
+import random
+from collections import namedtuple
+
+Article = namedtuple('Article', 'name kind text')
+
+# Approximate article lengths in characters; the largest is cleaned in chunks
+SIZES = {'short': 2000, 'medium': 10000, 'long': 40000}
+
+WORDS = (
+    'the of and to in is that it for on was with as by at from this be are an or have which one all '
+    'their there been has more when will would who so about up out into them than then its over only '
+    'system design network memory latency storage request process thread cache index query audio '
+    'signal model language research people city water energy market history policy science data'
+).split()
+
+def sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    return ' '.join(words).capitalize() + rng.choice(('.', '.', '.', '?', '!'))
+
+def paragraph(rng):
+    return ' '.join(sentence(rng) for _ in range(rng.randint(3, 7)))
+
+def article_text(rng, size):
+    """Build a titled article of roughly size characters."""
+    title = sentence(rng).rstrip('.?!')
+    paragraphs = [title]
+    length = len(title)
+    while length < size:
+        if len(paragraphs) % 6 == 0:
+            heading = sentence(rng).rstrip('.?!')
+            paragraphs.append(heading)
+            length += len(heading)
+        text = paragraph(rng)
+        paragraphs.append(text)
+        length += len(text) + 2
+    return '\n\n'.join(paragraphs)
+
+def article_html(rng, text):
+    """Wrap article text in a page with the navigation, scripts and footers of a real site."""
+    title, *paragraphs = text.split('\n\n')
+    body = '\n'.join(
+        f'<h2>{block}</h2>' if not block.endswith(('.', '?', '!')) else f'<p>{block}</p>'
+        for block in paragraphs
+    )
+    related = ''.join(f'<li><a href="/related/{i}">{sentence(rng)}</a></li>' for i in range(8))
+    return f'''<!DOCTYPE html>
+<html><head><title>{title}</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>window.analytics = {{ track: function () {{}} }};</script></head>
+<body>
+<nav><a href="/">Home</a> <a href="/news">News</a> <a href="/about">About</a></nav>
+<div class="share">Share this</div>
+<main><article><h1>{title}</h1><p class="byline">By A. Writer</p>
+{body}
+</article></main>
+<aside class="related"><h3>Related stories</h3><ul>{related}</ul></aside>
+<footer><p>Copyright Example Media. All rights reserved.</p></footer>
+</body></html>'''
+
+def build_corpus(count, seed=0):
+    """Build count articles cycling through the sizes, alternating text and HTML."""
+    rng = random.Random(seed)
+    sizes = list(SIZES.items())
+    articles = []
+    for i in range(count):
+        size_name, size = sizes[i % len(sizes)]
+        text = article_text(rng, size)
+        kind = 'html' if (i // len(sizes)) % 2 else 'text'
+        body = article_html(rng, text) if kind == 'html' else text
+        articles.append(Article(f'{size_name}-{kind}-{seed}-{i}', kind, body))
+    return articles
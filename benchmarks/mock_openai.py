@@ -0,0 +1,138 @@
+"""Local stand-in for the OpenAI chat completions and speech endpoints.
+
+Chat requests echo the article back as the "cleaned" text, speech requests
+return a canned MP3 whose length grows with the input, and both can be
+given an artificial latency. Synthetic article pages can also be served so
+URL fetching runs against a real HTTP server.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+CANNED_MP3 = Path(__file__).resolve().parent.parent / 'assets' / 'intro-sound.mp3'
+
+# Characters of text per repetition of the canned clip, roughly its spoken length
+CHARS_PER_CLIP = 40
+
+def load_clip(path=CANNED_MP3):
+    """Return the audio frames of an MP3 file, without tags or a Xing/Info frame, so copies can be joined."""
+    # Imported here because importing app modules reads the app configuration
+    from app.services.audio_service import iter_mp3_frames
+    return b''.join(bytes(frame) for _, frame in iter_mp3_frames(path.read_bytes()))
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self._send(404, b'Not found', 'text/plain')
+        else:
+            self._send(200, page.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.endswith('/chat/completions'):
+            self._chat(body)
+        elif self.path.endswith('/audio/speech'):
+            self._speech(body)
+        else:
+            self._send(404, b'{"error": {"message": "Not found"}}', 'application/json')
+
+    def _chat(self, body):
+        time.sleep(self.server.chat_latency)
+        prompt = body['messages'][-1]['content']
+        content = prompt.split(': ', 1)[-1]
+        if body.get('max_tokens') == 20:
+            # Title request: the first few words
+            reply = ' '.join(content.split()[:6]) or 'Untitled'
+        elif body.get('max_tokens'):
+            reply = 'A synthetic article used for benchmarking. It covers several topics at length.'
+        else:
+            # Cleanup request: the article unchanged
+            reply = content
+
+        prompt_tokens = sum(estimate_tokens(message['content']) for message in body['messages'])
+        completion_tokens = estimate_tokens(reply)
+        response = {
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': reply},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+        self._send(200, json.dumps(response).encode('utf-8'), 'application/json')
+
+    def _speech(self, body):
+        time.sleep(self.server.tts_latency)
+        repeats = max(1, round(len(body.get('input', '')) / CHARS_PER_CLIP))
+        self._send(200, self.server.clip * repeats, 'audio/mpeg')
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), chat_latency=0.0, tts_latency=0.0, pages=None):
+        super().__init__(address, MockOpenAIHandler)
+        self.chat_latency = chat_latency
+        self.tts_latency = tts_latency
+        self.pages = pages or {}
+        self._clip = None
+        self._clip_lock = threading.Lock()
+
+    @property
+    def clip(self):
+        # Loaded on first use, so the app can be configured after the server starts
+        with self._clip_lock:
+            if self._clip is None:
+                self._clip = load_clip()
+            return self._clip
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+def start_server(**kwargs):
+    """Start a mock server on a background thread and return it."""
+    server = MockOpenAIServer(**kwargs)
+    threading.Thread(target=server.serve_forever, name='mock-openai', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    os.environ.setdefault('API_KEY', 'mock')  # Required by the app configuration
+    parser = argparse.ArgumentParser(description='Run a local OpenAI stand-in for manual testing.')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--chat-latency', type=float, default=0.0, help='Seconds per chat request')
+    parser.add_argument('--tts-latency', type=float, default=0.0, help='Seconds per speech request')
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(('127.0.0.1', args.port), args.chat_latency, args.tts_latency)
+    print(f'Set OPENAI_BASE_URL={server.url}/v1')
+    server.serve_forever()
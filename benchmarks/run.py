@@ -0,0 +1,225 @@
+"""Benchmark the episode pipeline offline against a local OpenAI stand-in.
+
+Runs content processing, episode creation, feed generation and the Flask
+routes over a synthetic corpus, then reports p50/p95 latencies, episodes
+per minute and peak RSS. Everything is written to a temporary directory.
+
+Usage:
+    python -m benchmarks.run [--articles 12] [--chat-latency 0.2] [--tts-latency 0.5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .corpus import build_corpus
+from .mock_openai import start_server
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the Hypercast pipeline against a local OpenAI stand-in.')
+    parser.add_argument('--articles', type=int, default=12, help='Articles per scenario (default: 12)')
+    parser.add_argument('--chat-latency', type=float, default=0.0, help='Seconds per mock chat request')
+    parser.add_argument('--tts-latency', type=float, default=0.0, help='Seconds per mock speech request')
+    parser.add_argument('--feed-episodes', type=int, default=500, help='Episodes in the database for feed runs')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per route or feed scenario')
+    parser.add_argument('--workers', type=int, default=2, help='Background job workers (JOB_WORKERS)')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed')
+    parser.add_argument('--json', help='Also write results to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary data directory')
+    return parser.parse_args()
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of values fall (nearest rank)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class Results:
+    def __init__(self):
+        self.scenarios = {}
+
+    def record(self, name, durations, episodes=None, wall=None):
+        result = {
+            'count': len(durations),
+            'p50_ms': round(percentile(durations, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        if episodes is not None and wall:
+            result['episodes_per_min'] = round(episodes / wall * 60, 2)
+        self.scenarios[name] = result
+        print(self.format_row(name, result), flush=True)
+
+    @staticmethod
+    def format_row(name, result):
+        rate = result.get('episodes_per_min')
+        rate = f'{rate:>10.2f}' if rate is not None else f'{"-":>10}'
+        return (f'{name:<32} {result["count"]:>6} {result["p50_ms"]:>10.2f} '
+                f'{result["p95_ms"]:>10.2f} {rate} {result["peak_rss_mb"]:>10.1f}')
+
+    @staticmethod
+    def header():
+        return f'{"scenario":<32} {"n":>6} {"p50 ms":>10} {"p95 ms":>10} {"eps/min":>10} {"rss MB":>10}'
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def bench_content(results, articles, server):
+    """Fetch (for HTML) and process each article into episode text."""
+    from app.services.content_service import validate_input, process_validated_input
+
+    processed = []
+    durations = []
+    for article in articles:
+        start = time.perf_counter()
+        if article.kind == 'html':
+            content, url = validate_input(f'{server.url}/articles/{article.name}.html')
+        else:
+            content, url = validate_input(article.text)
+        processed.append(process_validated_input(content, url))
+        durations.append(time.perf_counter() - start)
+    results.record('process_validated_input', durations)
+    return processed
+
+def bench_create_episode(results, processed):
+    """Synthesize, combine and publish an episode for each processed article."""
+    from app.services.tts_service import create_episode
+
+    durations = []
+    start = time.perf_counter()
+    for result in processed:
+        path, seconds = timed(create_episode, result['text'], result['title'], result['description'], 'bench')
+        if path is None:
+            raise RuntimeError(f'create_episode failed for {result["title"]}')
+        durations.append(seconds)
+    results.record('create_episode', durations, len(processed), time.perf_counter() - start)
+
+def seed_episodes(count):
+    """Add placeholder episodes so feed and home page runs see a realistic archive."""
+    from app.services.database_service import db
+
+    for i in range(count):
+        db.add_episode(f'seed-{i}.mp3', f'Seeded episode {i}', f'Description of seeded episode {i}.\n\nSecond line.',
+                       'Mon, 01 Jan 2024 00:00:00 GMT', '00:10:00')
+
+def bench_feed(results, count):
+    """Generate the feed, with and without the rendered page cache."""
+    from app.services.feed_service import generate_feed
+    from app.services.database_service import db
+
+    durations = []
+    for _ in range(count):
+        db.invalidate_caches()  # Force a rebuild
+        durations.append(timed(generate_feed)[1])
+    results.record('generate_feed (uncached)', durations)
+
+    durations = [timed(generate_feed)[1] for _ in range(count)]
+    results.record('generate_feed (cached)', durations)
+
+def bench_routes(results, app, count):
+    """Time the home page and feed routes through the Flask test client."""
+    from app.services.database_service import db
+
+    client = app.test_client()
+    for name, path in (('GET /', '/'), ('GET /feed', '/feed')):
+        durations = []
+        for i in range(count):
+            if i % 10 == 0:
+                db.invalidate_caches()  # Include some cache rebuilds, as after new episodes
+            response, seconds = timed(client.get, path)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}')
+            durations.append(seconds)
+        results.record(name, durations)
+
+def bench_end_to_end(results, app, articles, server, api_key):
+    """Submit articles through POST /create and wait for the workers to publish them."""
+    client = app.test_client()
+    headers = {'X-API-Key': api_key}
+
+    submitted = {}
+    create_durations = []
+    start = time.perf_counter()
+    for article in articles:
+        value = f'{server.url}/articles/{article.name}.html' if article.kind == 'html' else article.text
+        response, seconds = timed(lambda: client.post('/create', json={'input': value}, headers=headers))
+        if response.status_code != 202:
+            raise RuntimeError(f'POST /create returned {response.status_code}: {response.get_data(as_text=True)}')
+        create_durations.append(seconds)
+        submitted[response.get_json()['job_id']] = time.perf_counter()
+    results.record('POST /create', create_durations)
+
+    latencies = []
+    pending = set(submitted)
+    while pending:
+        time.sleep(0.05)
+        for job_id in list(pending):
+            status = client.get(f'/create/{job_id}', headers=headers).get_json()
+            if status['status'] == 'failed':
+                raise RuntimeError(f'Job {job_id} failed: {status["error"]}')
+            if status['status'] == 'done':
+                latencies.append(time.perf_counter() - submitted[job_id])
+                pending.discard(job_id)
+    results.record('end-to-end job', latencies, len(articles), time.perf_counter() - start)
+
+def main():
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix='hypercast-bench-'))
+
+    # Each scenario gets its own articles so it starts with cold caches
+    corpora = [build_corpus(args.articles, seed=args.seed + i) for i in range(2)]
+    pages = {f'/articles/{article.name}.html': article.text
+             for corpus in corpora for article in corpus if article.kind == 'html'}
+
+    # Configuration is read at import, so point the app at the temporary
+    # directory and the mock before importing it
+    api_key = 'benchmark'
+    os.environ.update({
+        'OPENAI_API_KEY': 'benchmark',
+        'API_KEY': api_key,
+        'DATA_PATH': str(workdir / 'data'),
+        'AUDIO_PATH': str(workdir / 'audio'),
+        'JOB_WORKERS': str(args.workers),
+        'FLASK_DEBUG': 'true',  # Workers start on first submission instead of with the app
+    })
+    server = start_server(chat_latency=args.chat_latency, tts_latency=args.tts_latency, pages=pages)
+    os.environ['OPENAI_BASE_URL'] = f'{server.url}/v1'
+    from app import create_app
+    app = create_app()
+
+    results = Results()
+    print(f'Mock OpenAI at {server.url} (chat {args.chat_latency}s, tts {args.tts_latency}s), data in {workdir}')
+    print(Results.header())
+    try:
+        processed = bench_content(results, corpora[0], server)
+        bench_create_episode(results, processed)
+        seed_episodes(args.feed_episodes)
+        bench_feed(results, args.requests)
+        bench_routes(results, app, args.requests)
+        bench_end_to_end(results, app, corpora[1], server, api_key)
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'keep')},
+            'scenarios': results.scenarios,
+        }, indent=2))
+
+if __name__ == '__main__':
+    main()
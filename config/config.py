@@ -9,6 +9,14 @@ MAX_REQUEST_SIZE = 1 * 1024 * 1024  # 1MB request limit
 MAX_URL_LENGTH = 2048  # URL length limit
 MAX_INPUT_SIZE = 100 * 1024  # 100KB for direct text input
 MAX_CONTENT_INFLATION = 1.1  # Maximum 10% increase from GPT processing
+MAX_BATCH_SIZE = 50  # Maximum inputs per batch submission
+
+# URL fetching limits
+FETCH_CONNECT_TIMEOUT = float(os.getenv('FETCH_CONNECT_TIMEOUT', '5'))  # Seconds
+FETCH_READ_TIMEOUT = float(os.getenv('FETCH_READ_TIMEOUT', '30'))  # Seconds between received bytes
+FETCH_TOTAL_TIMEOUT = float(os.getenv('FETCH_TOTAL_TIMEOUT', '60'))  # Seconds for a whole page, however slowly it arrives
+FETCH_MAX_BYTES = 5 * 1024 * 1024  # 5MB page size limit
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '8'))  # Concurrent fetches and pooled connections per host
 
 # Server configuration
 SERVER_HOST = '0.0.0.0'
@@ -26,25 +34,75 @@ FEED_TITLE = os.getenv('FEED_TITLE', 'Hypercast')
 FEED_DESCRIPTION = os.getenv('FEED_DESCRIPTION', 'A personal podcast generator for turning articles into audio for offline listening.')
 FEED_IMAGE = os.getenv('FEED_IMAGE', 'podcast-cover.png')
 FEED_SOUND = os.getenv('FEED_SOUND', 'intro-sound.mp3')
+FEED_OUTRO_SOUND = os.getenv('FEED_OUTRO_SOUND', '')  # Optional sound appended to each episode
 FEED_LANGUAGE = 'en-us'
+FEED_PAGE_SIZE = int(os.getenv('FEED_PAGE_SIZE', '50'))  # Episodes per feed page; older ones are in archive pages
+HOME_PAGE_SIZE = int(os.getenv('HOME_PAGE_SIZE', '20'))  # Episodes per home page
 
 # Base paths
 APP_ROOT = Path(__file__).parent.parent
 STATIC_PATH = APP_ROOT / 'app' / 'static'
-AUDIO_PATH = STATIC_PATH / 'audio'
+AUDIO_PATH = Path(os.getenv('AUDIO_PATH', STATIC_PATH / 'audio'))
 ASSETS_PATH = APP_ROOT / 'assets'
 INTRO_SOUND_PATH = ASSETS_PATH / FEED_SOUND
+OUTRO_SOUND_PATH = ASSETS_PATH / FEED_OUTRO_SOUND if FEED_OUTRO_SOUND else None
+DATA_PATH = Path(os.getenv('DATA_PATH', 'data'))  # Relative to the working directory
+CACHE_PATH = DATA_PATH / 'cache'
+
+# Cache configuration
+CONTENT_CACHE_MAX_BYTES = int(os.getenv('CONTENT_CACHE_MAX_MB', '256')) * 1024 * 1024
+CONTENT_CACHE_TTL = int(os.getenv('CONTENT_CACHE_TTL', str(7 * 24 * 3600)))  # Seconds
+URL_CACHE_TTL = int(os.getenv('URL_CACHE_TTL', '3600'))  # Seconds before a fetched page is fetched again
+SEGMENT_CACHE_PATH = AUDIO_PATH / 'cache'
+SEGMENT_CACHE_MAX_BYTES = int(os.getenv('SEGMENT_CACHE_MAX_MB', '1024')) * 1024 * 1024
+ASSET_CACHE_PATH = CACHE_PATH / 'assets'  # Intro/outro sounds re-encoded to match TTS output
+
+# Database configuration
+DB_BUSY_TIMEOUT = 5.0  # Seconds to wait for a lock before failing with "database is locked"
+DB_MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file to memory-map for reads
 
 # Audio configuration
 AUDIO_OUTPUT_FORMAT = 'mp3'
-AUDIO_OUTPUT_QUALITY = '192k'
+AUDIO_OUTPUT_QUALITY = '192k'  # Used when segments need re-encoding to be combined
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+# Smaller encodings of each episode offered alongside the MP3, as comma-separated
+# codec:bitrate[:channels] profiles with codec one of opus, aac or mp3 (e.g. 'opus:48k:1,aac:64k:1')
+AUDIO_RENDITIONS = os.getenv('AUDIO_RENDITIONS', '')
+
+# Audio serving: '' streams files from Python, 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache/lighttpd) hand the transfer to the front-end server
+AUDIO_SENDFILE = os.getenv('AUDIO_SENDFILE', '').lower()
+AUDIO_ACCEL_PREFIX = os.getenv('AUDIO_ACCEL_PREFIX', '/internal/audio/')
+AUDIO_CACHE_MAX_AGE = 365 * 24 * 3600  # Episode files never change once written
 
 # TTS configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'openai').lower()  # 'openai', or a local engine: 'piper' or 'espeak'
 TTS_MODEL = os.getenv('TTS_MODEL', 'tts-1')
 TTS_VOICE = os.getenv('TTS_VOICE', 'onyx')
 TTS_SPEED = float(os.getenv('TTS_SPEED', '1.0'))
+TTS_CONCURRENCY = int(os.getenv('TTS_CONCURRENCY', '4'))  # Segments synthesized in parallel
+TTS_MAX_RETRIES = int(os.getenv('TTS_MAX_RETRIES', '3'))  # Retries per segment on transient errors
+TTS_RETRY_BACKOFF = float(os.getenv('TTS_RETRY_BACKOFF', '2.0'))  # Base backoff in seconds
+
+# Local TTS engine configuration (TTS_BACKEND=piper or espeak)
+TTS_LOCAL_BINARY = os.getenv('TTS_LOCAL_BINARY', '')  # Defaults to piper or espeak-ng on the PATH
+TTS_LOCAL_VOICE = os.getenv('TTS_LOCAL_VOICE', '')  # Piper: path to a voice model (.onnx); eSpeak: voice name
+TTS_LOCAL_PROCESSES = int(os.getenv('TTS_LOCAL_PROCESSES') or os.cpu_count() or 1)  # Segments synthesized in parallel
 
 # Content processing configuration
 CONTENT_CLEANUP_MODEL = os.getenv('CONTENT_CLEANUP_MODEL', 'gpt-4o-mini')
 TITLE_GENERATION_MODEL = os.getenv('TITLE_GENERATION_MODEL', 'gpt-4o-mini')
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))  # Concurrent GPT calls across all jobs
+# When to run GPT cleanup: 'auto' skips it for text that already looks clean, or 'always'/'never'
+CLEANUP_POLICY = os.getenv('CLEANUP_POLICY', 'auto').lower()
+if CLEANUP_POLICY not in ('auto', 'always', 'never'):
+    raise ValueError(f"Unknown CLEANUP_POLICY '{CLEANUP_POLICY}', expected one of: auto, always, never")
+# Skip GPT cleanup when HTML extraction is at least this confident (0-1); above 1 never skips
+HTML_SKIP_CLEANUP_CONFIDENCE = float(os.getenv('HTML_SKIP_CLEANUP_CONFIDENCE', '0.9'))
+CLEANUP_CHUNK_SIZE = int(os.getenv('CLEANUP_CHUNK_SIZE', '12000'))  # Characters per GPT cleanup request
+
+# Background job queue configuration
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # Episodes processed concurrently
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # Attempts before a job is marked failed
+JOB_POLL_INTERVAL = 5  # Seconds an idle worker waits before checking the queue again